@@ -11,7 +11,6 @@ It still has no memory of past conversations.
 # Import necessary libraries
 import sys
 import os
-import json
 
 # Ensure the parent directory is in the path so we can import 'common'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -19,6 +18,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Import Groq client and tools from the common package
 from common.client import get_groq_client
 from common.tools import search_web
+from common.streaming import stream_tool_action
+from common.deadline import Deadline, deadline_client, TIMEOUT_ERRORS, run_with_deadline, best_effort_answer
 
 # Define the model to be used
 MODEL = "llama-3.3-70b-versatile" # https://console.groq.com/models
@@ -48,7 +49,8 @@ def tool_user_agent():
     It allows the agent to use tools to gather information and then respond to the user.
     """
     # Initialize the Groq client
-    client = get_groq_client()
+    # (transient errors are retried only while the per-query time budget allows)
+    client = deadline_client(get_groq_client())
     # Initialize the messages list
     messages = [{
         "role": "system", 
@@ -68,25 +70,32 @@ def tool_user_agent():
         })
         
         # --- THE AGENTIC LOOP ---
+        # One time budget for the whole query (shared by every LLM call and tool call below)
+        deadline = Deadline()
         # We allow up to 3 turns for the agent to "think and act"
         for _ in range(3):
-            # Call the LLM to get the response
-            response = client.chat.completions.create(
-                model=MODEL,
-                messages=messages
-            )
-            # Extract the content from the response
-            ai_content = response.choices[0].message.content
-            
-            # Check if the AI wants to use a tool (is the response a JSON?)
+            ai_content = ""
             try:
-                tool_call = json.loads(ai_content)
+                # Stream the LLM response (it may only use the time left in the budget)
+                # The stream stops as soon as a complete {"action": "search", ...} object has been generated,
+                # even if it is surrounded by text, so we don't wait for (or pay for) the rest.
+                # Any other JSON (e.g. quoted in an answer) doesn't stop the stream.
+                ai_content, tool_call = stream_tool_action(
+                    client,
+                    keys=("action",),
+                    accept=lambda action: action.get("action") == "search",
+                    deadline=deadline,
+                    model=MODEL,
+                    messages=messages,
+                    timeout=deadline.timeout()
+                )
+            
                 # If the AI wants to use a tool, execute it
-                if tool_call.get("action") == "search":
+                if tool_call and tool_call.get("action") == "search":
                     query = tool_call.get("query")
                     
-                    # Execute the actual Python function from common/tools.py
-                    observation = search_web(query)
+                    # Execute the actual Python function from common/tools.py (within the time budget)
+                    observation = run_with_deadline(deadline, search_web, query)
                     
                     # Feed the result back to the LLM
                     messages.append({"role": "assistant", "content": ai_content})
@@ -95,16 +104,23 @@ def tool_user_agent():
                     print(f"🤖 Agent is using tool 'search_web' for: '{query}'...")
                     continue # Loop back to let the LLM see the search results
             
-            # If it's not JSON, it's the Final Answer
-            except json.JSONDecodeError:
+                # If there is no tool action, it's the Final Answer
                 print(f"\n** Agent Final Answer: {ai_content}")
                 print("\n---- END OF QUERY ----\n")
                 messages.append({"role": "assistant", "content": ai_content})
                 break
+            # If the time budget ran out, answer with what we have so far
+            except TIMEOUT_ERRORS:
+                final_answer = best_effort_answer(client, MODEL, messages, deadline)
+                print(f"\n⏱️ Time budget exhausted, best-effort answer: {final_answer}")
+                print("\n---- END OF QUERY ----\n")
+                messages.append({"role": "assistant", "content": final_answer})
+                break
             # If there is any other error, break the loop
             except Exception as e:
                 print(f"\nAgent Error: {str(e)}")
-                messages.append({"role": "assistant", "content": ai_content})
+                if ai_content:
+                    messages.append({"role": "assistant", "content": ai_content})
                 break
 
 if __name__ == "__main__":
@@ -17,6 +17,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Import Groq client and tools from the common package
 from common.client import get_groq_client
 from common.tools import search_web
+from common.messages import MessageStore
+from common.deadline import Deadline, deadline_client, DeadlineExceeded, TIMEOUT_ERRORS, run_with_deadline, best_effort_answer
 
 # Use the latest Llama model optimized for tool use
 MODEL = "llama-3.3-70b-versatile"
@@ -53,9 +55,10 @@ def tool_user_agent():
     It allows the agent to use tools to gather information and then respond to the user.
     """
     # Initialize the Groq client
-    client = get_groq_client()
-    # Initialize the messages list
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    # (transient errors are retried only while the per-query time budget allows)
+    client = deadline_client(get_groq_client())
+    # Initialize the messages list (a compact store: every message is converted only once)
+    messages = MessageStore([{"role": "system", "content": SYSTEM_PROMPT}])
     
     print("🛠️ Native Tool User Agent (Groq + Llama 3.3)")
 
@@ -68,47 +71,70 @@ def tool_user_agent():
         # Add user input to messages
         messages.append({"role": "user", "content": user_input})
         
+        # One time budget for the whole query (shared by every LLM call and tool call below)
+        deadline = Deadline()
+
         # Loop for the agent to think and act
         for _ in range(3):
-            # 3. Pass the 'tools' parameter to the API
-            response = client.chat.completions.create(
-                model=MODEL,
-                messages=messages,
-                tools=tools,
-                tool_choice="auto" # Model decides if it needs the tool
-            )
-            
-            response_message = response.choices[0].message
-            
-            # 4. Check if the model wants to call a tool
-            if response_message.tool_calls:
-                # Loop through the tool calls
-                for tool_call in response_message.tool_calls:
-                    # Get the function name and arguments
-                    function_name = tool_call.function.name
-                    args = json.loads(tool_call.function.arguments)
-                    
-                    print(f"🤖 Agent is calling '{function_name}' with: {args}...")
-                    
-                    # Execute the actual tool
-                    if function_name == "search_web":
-                        result = search_web(args['query'])
+            try:
+                # 3. Pass the 'tools' parameter to the API (and the time left in the budget as timeout)
+                response = client.chat.completions.create(
+                    model=MODEL,
+                    # The cached payload, sent as 'extra_body' so the SDK doesn't re-validate every message.
+                    # This relies on the SDK merging 'extra_body' over the request body; MessageStore checks that
+                    # once per process and falls back to plain 'messages=' if it ever changes.
+                    **messages.request(),
+                    tools=tools,
+                    tool_choice="auto", # Model decides if it needs the tool
+                    timeout=deadline.timeout()
+                )
+                
+                response_message = response.choices[0].message
+                
+                # 4. Check if the model wants to call a tool
+                if response_message.tool_calls:
+                    # Add the assistant's call to history (once, however many tools it calls)
+                    messages.append(response_message)
+
+                    # Loop through the tool calls
+                    for tool_call in response_message.tool_calls:
+                        # Get the function name and arguments
+                        function_name = tool_call.function.name
+                        args = json.loads(tool_call.function.arguments)
+                        
+                        print(f"🤖 Agent is calling '{function_name}' with: {args}...")
                         
-                        # Add the assistant's call and the tool's response to history
-                        messages.append(response_message)
+                        # Execute the actual tool (within the time budget)
+                        # A timed-out tool still gets a result, so every tool call in history is answered
+                        if function_name == "search_web":
+                            try:
+                                result = run_with_deadline(deadline, search_web, args['query'])
+                            except DeadlineExceeded as e:
+                                result = f"Error: {str(e)}"
+                        else:
+                            result = f"Error: Tool {function_name} not found."
+
+                        # Add the tool's response to history (every tool call needs one)
                         messages.append({
                             "role": "tool",
                             "tool_call_id": tool_call.id,
                             "name": function_name,
                             "content": result
                         })
-                continue # Let the LLM process the search result
-            
-            # 5. Final Answer
-            else:
-                final_answer = response_message.content
-                print(f"\n** Agent Final Answer: {final_answer}")
-                # Add the final answer to messages
+                    continue # Let the LLM process the search result
+                
+                # 5. Final Answer
+                else:
+                    final_answer = response_message.content
+                    print(f"\n** Agent Final Answer: {final_answer}")
+                    # Add the final answer to messages
+                    messages.append({"role": "assistant", "content": final_answer})
+                    break
+
+            # 6. If the time budget ran out, answer with what we have so far
+            except TIMEOUT_ERRORS:
+                final_answer = best_effort_answer(client, MODEL, messages.payload(), deadline, tools=tools, tool_choice="none")
+                print(f"\n⏱️ Time budget exhausted, best-effort answer: {final_answer}")
                 messages.append({"role": "assistant", "content": final_answer})
                 break
 
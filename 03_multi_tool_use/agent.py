@@ -11,7 +11,6 @@ It maintains a temporary session context but still lacks persistent memory.
 # Import necessary libraries
 import sys
 import os
-import json
 
 # Ensure the parent directory is in the path so we can import 'common'
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -19,6 +18,9 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Import Groq client and the expanded toolset from the common package
 from common.client import get_groq_client
 from common.tools import search_web, calculator
+from common.calculator_pool import POOL_ENABLED, get_calculator_pool
+from common.streaming import stream_tool_action
+from common.deadline import Deadline, deadline_client, TIMEOUT_ERRORS, run_with_deadline, best_effort_answer
 
 # Define the model to be used
 MODEL = "llama-3.3-70b-versatile"
@@ -44,7 +46,12 @@ def multi_tool_agent():
     Allows up to 5 iterations to support multi-step problem solving.
     """
     # Initialize the Groq client
-    client = get_groq_client()
+    # (transient errors are retried only while the per-query time budget allows)
+    client = deadline_client(get_groq_client())
+
+    # Start the calculator worker pool now, so its startup time doesn't count against the first query's deadline
+    if POOL_ENABLED:
+        get_calculator_pool()
     
     # Initialize the messages list
     messages = [{"role": "system", "content": SYSTEM_PROMPT}]
@@ -64,19 +71,23 @@ def multi_tool_agent():
         
         # --- THE MULTI-STEP AGENTIC LOOP ---
         # Increased to 5 turns to allow for complex 'Search -> Calculate' chains
+        # One time budget for the whole query (shared by every LLM call and tool call below)
+        deadline = Deadline()
         for step in range(5):
             try:
-                # Step 3. Get the response from the LLM
-                response = client.chat.completions.create(
+                # Step 3. Stream the response from the LLM (it may only use the time left in the budget)
+                # Step 4. ...and parse the tool call while it streams: as soon as a complete
+                # {"tool": ...} object arrives (even inside chatty text), the rest of the generation is cancelled.
+                # Only objects naming one of our tools count - JSON quoted in the prose doesn't stop the stream.
+                ai_content, tool_call = stream_tool_action(
+                    client,
+                    keys=("tool",),
+                    accept=lambda action: action.get("tool") in ("search_web", "calculator"),
+                    deadline=deadline,
                     model=MODEL,
-                    messages=messages
+                    messages=messages,
+                    timeout=deadline.timeout()
                 )
-                
-                # Get the content from the response
-                ai_content = response.choices[0].message.content
-                
-                # Step 4. Try to parse tool call
-                tool_call = extract_json(ai_content)
 
                 # If tool_call is not None, then it is a tool call
                 if tool_call:
@@ -86,9 +97,9 @@ def multi_tool_agent():
                     print(f"🤖 Step {step+1}: Using {tool_name} for '{tool_input}'...")
 
                     if tool_name == "search_web":
-                        observation = search_web(tool_input)
+                        observation = run_with_deadline(deadline, search_web, tool_input)
                     elif tool_name == "calculator":
-                        observation = calculator(tool_input)
+                        observation = run_with_deadline(deadline, calculator, tool_input)
                     else:
                         observation = f"Error: Tool '{tool_name}' not found."
                     
@@ -103,32 +114,20 @@ def multi_tool_agent():
                     print("\n---- END OF QUERY ----\n")
                     messages.append({"role": "assistant", "content": ai_content})
                     break
+
+            except TIMEOUT_ERRORS:
+                # Step 5. If the time budget ran out, answer with what we have so far
+                final_answer = best_effort_answer(client, MODEL, messages, deadline)
+                print(f"\n⏱️ Time budget exhausted, best-effort answer: {final_answer}")
+                print("\n---- END OF QUERY ----\n")
+                messages.append({"role": "assistant", "content": final_answer})
+                break
                 
             except Exception as e:
                 # Step 6. If there is any other error, break the loop
                 print(f"\nAgent Error: {str(e)}")
                 break
 
-def extract_json(text):
-    """
-    Extracts the first valid JSON object from a string, 
-    even if it is surrounded by other text.
-    """
-    try:
-        # Try direct parsing first
-        return json.loads(text)
-    except json.JSONDecodeError:
-        # If that fails, look for the first '{' and the last '}'
-        start = text.find('{')
-        end = text.rfind('}') + 1
-        
-        if start != -1 and end != -1:
-            try:
-                return json.loads(text[start:end])
-            except:
-                return None
-        return None
-
 if __name__ == "__main__":
     multi_tool_agent()
 
@@ -152,4 +151,15 @@ We replaced the simple json.loads() with a helper function 'extract_json(text)'.
 3. It extracts the substring between those indices and attempts to parse it again.
 
 This allows the Agent to be "conversational" (chatty) while still executing tool calls reliably.
+
+UPDATE: Streaming Tool-Action Parser
+------------------------------------
+The "first '{' and last '}'" trick breaks when the text contains more than one brace pair
+(e.g. two JSON objects, or braces in the prose), and we still had to wait for the whole completion.
+'extract_json' was replaced by 'stream_tool_action' (common/streaming.py):
+1. The completion is streamed and scanned incrementally, tracking nested braces and JSON strings.
+2. As soon as an object naming one of our tools ({"tool": "search_web" | "calculator", ...}) closes,
+   it is parsed and returned (other JSON, e.g. a format example quoted in the text, is ignored).
+3. The stream is closed right away, cancelling the rest of the generation, and the tool is dispatched.
+4. If the stream ends without a detected object, a final pass searches the whole text for one.
 """
\ No newline at end of file
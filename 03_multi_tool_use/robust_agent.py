@@ -22,11 +22,20 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 # Import Groq client and the expanded toolset from the common package
 from common.client import get_groq_client
-from common.tools import search_web, calculator
+from common.tools import search_web, search_many, calculator
+from common.calculator_pool import POOL_ENABLED, get_calculator_pool
+from common.planner import plan_tool_calls, execute_plan, extract_numbers, plan_to_messages
+from common.messages import MessageStore
+from common.deadline import Deadline, deadline_client, DeadlineExceeded, TIMEOUT_ERRORS, run_with_deadline, best_effort_answer
 
 # Define the model to be used
 MODEL = "llama-3.3-70b-versatile"
 
+# Planner mode: ask for the whole tool plan (a DAG) in one call and run independent steps in parallel.
+# Off by default: it costs one extra LLM call per query, which only pays off for multi-step questions.
+# Enable with AGENT_PLANNER=1.
+PLANNER_MODE = os.getenv("AGENT_PLANNER", "0") == "1"
+
 # 1. Define the Native Tool Schema
 # We describe BOTH tools here so the LLM knows its full capability.
 tools_schema = [
@@ -48,6 +57,25 @@ tools_schema = [
             }
         }
     },
+    # Define the search_many tool (several reformulations in a single step)
+    {
+        "type": "function",
+        "function": {
+            "name": "search_many",
+            "description": "Search the web for several related queries at once and get one merged, de-duplicated result list. Prefer this over repeated 'search_web' calls when a question needs multiple lookups.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "The search queries to run (e.g., ['bitcoin price today', 'ethereum price today'])."
+                    }
+                },
+                "required": ["queries"]
+            }
+        }
+    },
     # Define the calculator tool
     {
         "type": "function",
@@ -74,10 +102,24 @@ SYSTEM_PROMPT = """
 You are a Multi-Tool Research Assistant. 
 You have access to a search engine and a calculator.
 - Use 'search_web' for current events, facts, or information you don't know.
+- Use 'search_many' when you need several searches (or reformulations) at once.
 - Use 'calculator' for any math calculations, even simple ones, to ensure accuracy.
 If you need to perform a sequence of actions (like search then calculate), do them one by one.
 """
 
+def run_tool(function_name: str, function_args: dict) -> str:
+    """
+    --- THE ROUTER ---
+    Calls the tool if it exists (shared by the ReAct loop and the planner).
+    """
+    if function_name == "search_web":
+        return search_web(function_args.get("query"))
+    elif function_name == "search_many":
+        return search_many(function_args.get("queries") or [])
+    elif function_name == "calculator":
+        return calculator(function_args.get("expression"))
+    return f"Error: Tool {function_name} not found."
+
 def robust_multi_tool_agent():
     """
     Orchestrates the ReAct loop for multiple tools.
@@ -85,10 +127,15 @@ def robust_multi_tool_agent():
     Uses the 'tools' parameter in Groq API for reliable function calling.
     """
     # Initialize the Groq client
-    client = get_groq_client()
+    # (transient errors are retried only while the per-query time budget allows)
+    client = deadline_client(get_groq_client())
+
+    # Start the calculator worker pool now, so its startup time doesn't count against the first query's deadline
+    if POOL_ENABLED:
+        get_calculator_pool()
     
-    # Initialize the conversation history
-    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    # Initialize the conversation history (a compact store: every message is converted only once)
+    messages = MessageStore([{"role": "system", "content": SYSTEM_PROMPT}])
     
     print("🛠️ Robust Multi-Tool Agent (Native Groq API) (Type 'exit' to stop)")
 
@@ -98,8 +145,30 @@ def robust_multi_tool_agent():
         if user_input.lower() in ["exit", "quit"]: 
             break
         
+        # Remember where this query's messages start, so a failed query can be rolled back cleanly
+        history_length = len(messages)
+
         # Step 2: Add user input to the messages list
         messages.append({"role": "user", "content": user_input})
+
+        # One time budget for the whole query (shared by the planner, every LLM call and tool call below)
+        deadline = Deadline()
+
+        # Step 2.1: Planner mode - plan all tool calls at once and execute them as a DAG
+        # The results land in history as tool messages. If every step succeeded, the next call only
+        # composes the answer (no more tools); if there is no usable plan or a step failed, the loop
+        # below carries on as usual.
+        answer_only = False
+        if PLANNER_MODE:
+            plan = plan_tool_calls(client, MODEL, messages.payload(), tools_schema, deadline=deadline)
+            if plan:
+                print(f"🗺️ Planner: executing {len(plan)} step(s) as a dependency graph...")
+                for plan_step in plan:
+                    print(f"   - {plan_step['id']}: {plan_step['tool']} {plan_step['args']} (after {plan_step['depends_on'] or 'nothing'})")
+                results = execute_plan(plan, run_tool, deadline=deadline,
+                                       extract=lambda items: extract_numbers(client, MODEL, items, deadline))
+                messages.extend(plan_to_messages(plan, results))
+                answer_only = not any(results[plan_step["id"]].startswith("Error") for plan_step in plan)
         
         # --- THE MULTI-STEP AGENTIC LOOP ---
         # Increased to 5 turns to allow for complex 'Search -> Calculate' chains
@@ -108,10 +177,15 @@ def robust_multi_tool_agent():
                 # Step 3: Call the API with the tools definition
                 response = client.chat.completions.create(
                     model=MODEL,
-                    messages=messages,
+                    # The cached payload, sent as 'extra_body' so the SDK doesn't re-validate every message.
+                    # This relies on the SDK merging 'extra_body' over the request body; MessageStore checks that
+                    # once per process and falls back to plain 'messages=' if it ever changes.
+                    **messages.request(),
                     tools=tools_schema,
-                    tool_choice="auto", # Let the model decide
-                    max_tokens=4096
+                    # Let the model decide (or, after a fully executed plan, just answer)
+                    tool_choice="none" if answer_only else "auto",
+                    max_tokens=4096,
+                    timeout=deadline.timeout() # Only the time left in the budget
                 )
                 
                 # Get the response message and tool calls
@@ -130,15 +204,12 @@ def robust_multi_tool_agent():
                         
                         print(f"🤖 Step {step+1}: Calling '{function_name}' with {function_args}...")
                         
-                        # --- THE ROUTER ---
-                        # Step 5: Call the tool if it exists
-                        tool_result = ""
-                        if function_name == "search_web":
-                            tool_result = search_web(function_args.get("query"))
-                        elif function_name == "calculator":
-                            tool_result = calculator(function_args.get("expression"))
-                        else:
-                            tool_result = f"Error: Tool {function_name} not found."
+                        # Step 5: Call the tool if it exists (within the time budget)
+                        # A timed-out tool still gets a result, so every tool call in history is answered
+                        try:
+                            tool_result = run_with_deadline(deadline, run_tool, function_name, function_args)
+                        except DeadlineExceeded as e:
+                            tool_result = f"Error: {str(e)}"
 
                         # Step 6: Append the Tool Output (Observation)
                         messages.append({
@@ -159,11 +230,22 @@ def robust_multi_tool_agent():
 
                     messages.append({"role": "assistant", "content": final_answer})
                     break
+
+            except TIMEOUT_ERRORS:
+                # Step 8: If the time budget ran out, answer with what we have so far
+                final_answer = best_effort_answer(client, MODEL, messages.payload(), deadline, tools=tools_schema, tool_choice="none")
+                print(f"\n⏱️ Time budget exhausted, best-effort answer: {final_answer}")
+                print("\n---- END OF QUERY ----\n")
+                messages.append({"role": "assistant", "content": final_answer})
+                break
             
             except Exception as e:
-                # Step 8: If there is any other error, break the loop
+                # Step 9: If there is any other error, break the loop
+                # Drop everything this query added (the planner's tool calls included), so that no tool call
+                # is left without its answer - the API would reject the history on every later query
                 print(f"Error during agent execution: {e}")
-                messages.pop()
+                while len(messages) > history_length:
+                    messages.pop()
                 break
 
 if __name__ == "__main__":
@@ -17,10 +17,21 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 # Import Groq client and the database functions
 from common.client import get_groq_client
 from common.database import initialize_db, save_message, get_chat_history, clear_history
+from common.memory import SummaryMemory
+from common.cassette import get_cassette
 
 # Define the model to be used
 MODEL = "llama-3.3-70b-versatile"
 
+# Source agent tag used for every message saved by this agent
+SOURCE_AGENT = '04_memory_agent'
+
+# Number of recent messages sent verbatim to the LLM (older ones live in the rolling summary)
+HISTORY_WINDOW = 10
+
+# Fold messages into the rolling summary once this many have left the recent window
+SUMMARY_EVERY = 6
+
 
 def memory_aware_agent():
     """
@@ -40,15 +51,17 @@ def memory_aware_agent():
     
     # 3. Fetch past history from SQLite
     # We pull the last 10 messages to keep the context clean
-    past_history = get_chat_history(session_id, limit=10)
+    past_history = get_chat_history(session_id, limit=HISTORY_WINDOW)
+
+    # Two-tier memory: the recent window + a rolling summary of everything older
+    memory = SummaryMemory(client, MODEL, SOURCE_AGENT, session_id,
+                           window=HISTORY_WINDOW, update_every=SUMMARY_EVERY)
     
-    # Initialize the session with System Prompt + Past History
-    messages = [
-        {
-            "role": "system", 
-            "content": f"You are a helpful assistant. The user's name is {user_name}."
-        }
-    ]
+    # The System Prompt is sent first on every turn
+    system_prompt = {
+        "role": "system", 
+        "content": f"You are a helpful assistant. The user's name is {user_name}."
+    }
     
     # 4. Greet the user based on history
     if past_history:
@@ -67,8 +80,6 @@ def memory_aware_agent():
     else:
         print(f"👋 Hello {user_name}! Nice to meet you.")
     
-    messages.extend(past_history)
-    
     print("\n" + "="*50)
 
     # 5. Main Conversation Loop
@@ -76,13 +87,21 @@ def memory_aware_agent():
         # Get user input
         user_input = input(f"\n[{user_name}]: ").strip()
         
-        # Exit if user types 'exit'
+        # Exit if user types 'exit' (let a running summary update finish first)
         if user_input.lower() in ["exit", "quit"]: 
+            memory.wait(timeout=30)
             break
         
-        # Save User message to DB and add to messages list
-        save_message(source_agent='04_memory_agent', session_id=session_id, role="user", content=user_input)
-        messages.append({"role": "user", "content": user_input})
+        # Save User message to DB
+        save_message(source_agent=SOURCE_AGENT, session_id=session_id, role="user", content=user_input)
+
+        # When recording or replaying, let a running summary update finish first: otherwise the prompt
+        # depends on thread timing, and a replay would not find the recorded request
+        if get_cassette():
+            memory.wait()
+
+        # Build the context: System Prompt + Rolling Summary + everything it does not cover yet (bounded size)
+        messages = [system_prompt] + memory.context()
         
         # Get response from LLM
         response = client.chat.completions.create(
@@ -94,9 +113,11 @@ def memory_aware_agent():
         ai_reply = response.choices[0].message.content
         print(f"\n[Agent]: {ai_reply}")
         
-        # Save AI response to DB and add to messages list
-        save_message(source_agent='04_memory_agent', session_id=session_id, role="assistant", content=ai_reply)
-        messages.append({"role": "assistant", "content": ai_reply})
+        # Save AI response to DB
+        save_message(source_agent=SOURCE_AGENT, session_id=session_id, role="assistant", content=ai_reply)
+
+        # Fold older messages into the rolling summary (in the background, only the new delta)
+        memory.maybe_update()
 
 if __name__ == "__main__":
     memory_aware_agent()
\ No newline at end of file
@@ -0,0 +1,249 @@
+# common/calculator_pool.py
+
+"""
+Calculator Worker Pool Module
+
+The calculator evaluates whatever expression the LLM sends. numexpr is safe from code injection,
+but not from pathological input: a huge expression can burn CPU or memory and, in-process,
+slow down every session sharing the agent process.
+
+CalculatorPool evaluates expressions in a few pre-started worker processes instead:
+- every call has a wall-clock timeout (a stuck worker is killed and replaced),
+- every worker runs with OS limits: RLIMIT_AS (memory headroom) and RLIMIT_CPU (CPU seconds),
+- workers are recycled after a number of calls, so leaks and used-up CPU time don't pile up,
+- queue depth and failure counters are available via metrics().
+
+Configuration (environment variables):
+  CALCULATOR_POOL       : 0 to evaluate in-process instead (default: 1)
+  CALCULATOR_WORKERS    : number of worker processes (default: 2)
+  CALCULATOR_TIMEOUT    : seconds per calculation (default: 2)
+  CALCULATOR_MEMORY_MB  : extra memory a worker may allocate (default: 256)
+  CALCULATOR_CPU_SECONDS: CPU seconds a worker may use before it is replaced (default: 10)
+  CALCULATOR_METRICS    : 1 to print the pool metrics when the program exits (default: 0)
+
+Run this file for a quick demo (normal latency, a pathological expression, metrics):
+    python3 common/calculator_pool.py
+"""
+
+# Import required libraries
+import os
+import time
+import queue
+import atexit
+import threading
+import multiprocessing
+
+# Resource limits are POSIX only (the pool still works without them, e.g. on Windows)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Pool configuration
+POOL_ENABLED = os.getenv("CALCULATOR_POOL", "1") == "1"
+POOL_SIZE = int(os.getenv("CALCULATOR_WORKERS", "2"))
+CALL_TIMEOUT = float(os.getenv("CALCULATOR_TIMEOUT", "2"))
+MEMORY_LIMIT_MB = int(os.getenv("CALCULATOR_MEMORY_MB", "256"))
+CPU_LIMIT_SECONDS = int(os.getenv("CALCULATOR_CPU_SECONDS", "10"))
+
+# Recycle a worker after this many calculations
+MAX_TASKS_PER_WORKER = 500
+
+# Print the pool metrics when the program exits
+METRICS_ENABLED = os.getenv("CALCULATOR_METRICS", "0") == "1"
+
+
+class CalculatorError(Exception):
+    """Raised when an expression cannot be evaluated (invalid, too slow or too big)."""
+
+
+def _apply_limits(memory_mb: int, cpu_seconds: int) -> None:
+    """Limits the memory and CPU time of the current (worker) process."""
+    if resource is None:
+        return
+    # Memory: allow 'memory_mb' on top of what the worker already uses (Linux exposes it in /proc)
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+        limit = current + memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (OSError, ValueError):
+        pass
+    # CPU: the kernel stops the worker once it has used 'cpu_seconds' more CPU time
+    try:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = int(usage.ru_utime + usage.ru_stime) + 1
+        resource.setrlimit(resource.RLIMIT_CPU, (used + cpu_seconds, used + cpu_seconds + 1))
+    except (OSError, ValueError):
+        pass
+
+
+def _worker_main(conn, memory_mb: int, cpu_seconds: int) -> None:
+    """Worker process loop: receive an expression, send back ('ok', result) or ('error', message)."""
+    # One numexpr thread per worker, so the memory limit is not eaten by thread stacks
+    os.environ["NUMEXPR_MAX_THREADS"] = "1"
+    import numexpr as ne
+    ne.set_num_threads(1)
+    _apply_limits(memory_mb, cpu_seconds)
+
+    while True:
+        expression = conn.recv()
+        if expression is None:
+            break
+        try:
+            conn.send(("ok", str(ne.evaluate(expression))))
+        except MemoryError:
+            conn.send(("error", "Expression needs too much memory."))
+        except Exception as e:
+            conn.send(("error", str(e)))
+
+
+class _Worker:
+    """One worker process and its end of the pipe."""
+
+    def __init__(self, context, memory_mb: int, cpu_seconds: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, memory_mb, cpu_seconds), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def stop(self, kill: bool = False) -> None:
+        try:
+            if kill:
+                self.process.kill()
+            else:
+                self.conn.send(None)
+            self.process.join(timeout=1)
+        except (OSError, ValueError):
+            pass
+        finally:
+            self.conn.close()
+
+
+class CalculatorPool:
+    """A small pool of pre-started calculator processes with timeouts, limits and recycling."""
+
+    def __init__(self, size: int = POOL_SIZE, timeout: float = CALL_TIMEOUT, memory_mb: int = MEMORY_LIMIT_MB,
+                 cpu_seconds: int = CPU_LIMIT_SECONDS, max_tasks: int = MAX_TASKS_PER_WORKER):
+        # 'forkserver' forks new workers from a clean helper process (safe even if the agent uses threads)
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self.size = size
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.cpu_seconds = cpu_seconds
+        self.max_tasks = max_tasks
+
+        # Metrics
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._stats = {"calls": 0, "errors": 0, "timeouts": 0, "crashes": 0, "recycled": 0, "max_queue_depth": 0}
+
+        # Pre-start all the workers
+        self._idle = queue.Queue()
+        for _ in range(size):
+            self._idle.put(self._new_worker())
+
+    def _new_worker(self) -> _Worker:
+        return _Worker(self._context, self.memory_mb, self.cpu_seconds)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def evaluate(self, expression: str) -> str:
+        """Evaluates an expression in a worker. Raises CalculatorError if it fails, is too slow or too big."""
+        # Wait for a free worker (this is where calls queue up)
+        with self._lock:
+            self._waiting += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._waiting)
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            self._count("timeouts")
+            raise CalculatorError("Calculator is busy, please try again.")
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+        self._count("calls")
+        try:
+            worker.conn.send(expression)
+            if not worker.conn.poll(self.timeout):
+                # Too slow: kill the worker (the only way to stop it) and start a fresh one
+                self._count("timeouts")
+                worker.stop(kill=True)
+                worker = self._new_worker()
+                raise CalculatorError(f"Expression took longer than {self.timeout:g}s.")
+            status, value = worker.conn.recv()
+        except (EOFError, OSError):
+            # The worker died (e.g. it hit its CPU or memory limit)
+            self._count("crashes")
+            worker.stop(kill=True)
+            worker = self._new_worker()
+            raise CalculatorError("Expression exceeded the calculator's resource limits.")
+        finally:
+            # Recycle workers that have done enough work, then hand the worker back to the pool
+            worker.tasks += 1
+            if worker.tasks >= self.max_tasks:
+                self._count("recycled")
+                worker.stop()
+                worker = self._new_worker()
+            self._idle.put(worker)
+
+        if status == "error":
+            self._count("errors")
+            raise CalculatorError(value)
+        return value
+
+    def metrics(self) -> dict:
+        """Current queue depth and counters."""
+        with self._lock:
+            return {"workers": self.size, "idle": self._idle.qsize(), "queue_depth": self._waiting, **self._stats}
+
+    def report(self) -> str:
+        m = self.metrics()
+        return (f"🧮 Calculator pool: {m['calls']} calls, {m['errors']} errors, {m['timeouts']} timeouts, "
+                f"{m['crashes']} crashes, {m['recycled']} recycled, max queue depth {m['max_queue_depth']}")
+
+    def shutdown(self) -> None:
+        """Stops all idle workers."""
+        while not self._idle.empty():
+            self._idle.get_nowait().stop()
+
+
+# The calculator pool of this process (started on first use)
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_calculator_pool() -> CalculatorPool:
+    """Returns the process-wide calculator pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CalculatorPool()
+            if METRICS_ENABLED:
+                atexit.register(lambda: print(_pool.report()))
+    return _pool
+
+
+if __name__ == "__main__":
+    pool = CalculatorPool()
+
+    # 1. Normal calls should stay fast
+    start = time.perf_counter()
+    for i in range(200):
+        pool.evaluate(f"{i} * 3.5 + sqrt({i})")
+    print(f"✅ 200 normal calls: {(time.perf_counter() - start) / 200 * 1000:.3f} ms/call")
+
+    # 2. A pathological expression is contained (timeout or resource limit) and the pool recovers
+    start = time.perf_counter()
+    try:
+        pool.evaluate("+".join(["sin(1.0)*cos(2.0)"] * 20000))
+    except CalculatorError as e:
+        print(f"🛑 Pathological expression stopped after {time.perf_counter() - start:.2f}s: {e}")
+    print(f"✅ Pool still healthy: 6 * 7 = {pool.evaluate('6 * 7')}")
+
+    print(pool.report())
+    pool.shutdown()
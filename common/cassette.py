@@ -0,0 +1,286 @@
+# common/cassette.py
+
+"""
+Cassette Module (Record / Replay)
+
+Every agent run normally needs a live Groq API and DuckDuckGo. To load-test, profile or
+regression-test the agents offline, interactions can be recorded to a "cassette" and
+played back later:
+
+- record : every chat.completions.create call and every tool call (search_web, search_many,
+           calculator) is executed for real and written to a gzip-compressed JSON-lines file.
+- replay : the same calls are answered from the cassette, without network or API key.
+           Requests are matched by a hash of their content, so a replay is deterministic.
+
+Prompts of the memory-aware agent depend on what is in the database, so the database is part
+of the recording: record mode snapshots it (next to the cassette) before the run, and replay
+runs against a throwaway copy of that snapshot - the real database is never touched.
+
+Configuration (environment variables):
+  AGENT_CASSETTE_MODE   : off (default) | record | replay
+  AGENT_CASSETTE        : cassette file (default: data/cassettes/<agent folder>-<script>.jsonl.gz)
+  AGENT_CASSETTE_TIMING : 1 to replay with the recorded latency, 0 (default) to run at CPU speed
+
+Example:
+  AGENT_CASSETTE_MODE=record python3 03_multi_tool_use/robust_agent.py
+  AGENT_CASSETTE_MODE=replay python3 03_multi_tool_use/robust_agent.py
+"""
+
+# Import required libraries
+import os
+import sys
+import gzip
+import json
+import time
+import atexit
+import shutil
+import sqlite3
+import hashlib
+import tempfile
+import functools
+import threading
+from collections import defaultdict, deque
+from types import SimpleNamespace
+
+from groq.types.chat import ChatCompletion, ChatCompletionChunk
+
+# Where cassettes are stored by default (next to the database)
+CASSETTE_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "cassettes")
+
+# Request options that do not change the answer (and may differ between runs)
+VOLATILE_OPTIONS = {"timeout", "extra_headers"}
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a request was never recorded."""
+
+
+def _jsonable(value):
+    """Makes SDK objects (pydantic models) JSON serializable, so requests can be hashed."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump(exclude_none=True)
+    return str(value)
+
+
+class Cassette:
+    """A recorded sequence of LLM and tool interactions stored in a gzip JSON-lines file."""
+
+    def __init__(self, path: str, mode: str, timing: bool = False):
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._entries = defaultdict(deque)
+
+        if mode == "record":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._file = gzip.open(path, "wt", encoding="utf-8")
+            # Write the gzip trailer when the agent exits
+            atexit.register(self.close)
+        elif mode == "replay":
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Cassette not found: {path} (record it first with AGENT_CASSETTE_MODE=record)")
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                try:
+                    for line in f:
+                        entry = json.loads(line)
+                        self._entries[(entry["kind"], entry["key"])].append(entry)
+                except (EOFError, json.JSONDecodeError):
+                    # The recording was cut short (e.g. the process was killed) - keep what we have
+                    pass
+
+    @staticmethod
+    def key(kind: str, request: dict) -> str:
+        """Stable hash of a request (volatile options such as the timeout are ignored)."""
+        request = {k: v for k, v in request.items() if k not in VOLATILE_OPTIONS}
+        blob = json.dumps({"kind": kind, "request": request}, sort_keys=True, default=_jsonable)
+        return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+    def record(self, kind: str, key: str, payload, elapsed: float) -> None:
+        """Appends one interaction to the cassette (flushed right away, so an interrupted run is still usable)."""
+        line = json.dumps({"kind": kind, "key": key, "elapsed": round(elapsed, 4), "payload": payload},
+                          separators=(",", ":"), default=_jsonable)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def replay(self, kind: str, key: str):
+        """Returns the recorded payload for a request (a request recorded N times is replayed N times)."""
+        with self._lock:
+            entries = self._entries.get((kind, key))
+            if not entries:
+                raise CassetteMiss(f"No recorded '{kind}' interaction matches this request (key {key[:12]}).")
+            # Keep the last recording around, so extra identical requests still get an answer
+            entry = entries.popleft() if len(entries) > 1 else entries[0]
+
+        # Optionally simulate the recorded latency
+        if self.timing:
+            time.sleep(entry["elapsed"])
+        return entry["payload"]
+
+    @property
+    def snapshot_path(self) -> str:
+        """Database snapshot stored next to the cassette (e.g. 'x.jsonl.gz' -> 'x.db')."""
+        base = self.path[:-len(".jsonl.gz")] if self.path.endswith(".jsonl.gz") else self.path
+        return base + ".db"
+
+    def database(self, db_path: str) -> str:
+        """
+        Returns the database file the agent should use during this run.
+        - record: snapshots the database as it is before the run, and keeps using it.
+        - replay: restores the snapshot into a throwaway copy (deleted on exit), so every replay
+                  starts from the recorded state.
+        """
+        if self.mode == "record":
+            # SQLite's backup API gives a consistent copy even if the file is in use
+            source, target = sqlite3.connect(db_path), sqlite3.connect(self.snapshot_path)
+            with target:
+                source.backup(target)
+            source.close()
+            target.close()
+            return db_path
+
+        fd, replay_path = tempfile.mkstemp(prefix="replay-", suffix=".db")
+        os.close(fd)
+        if os.path.exists(self.snapshot_path):
+            shutil.copyfile(self.snapshot_path, replay_path)
+        else:
+            print("⚠️ No database snapshot next to the cassette - replaying with an empty database.")
+        atexit.register(lambda: os.path.exists(replay_path) and os.remove(replay_path))
+        return replay_path
+
+    def close(self) -> None:
+        """Closes the cassette file (record mode)."""
+        if self.mode == "record" and not self._file.closed:
+            self._file.close()
+
+
+# The cassette of this process (created on first use from the environment)
+_cassette = None
+_cassette_loaded = False
+
+def get_cassette():
+    """Returns the process-wide cassette, or None when record/replay is off."""
+    global _cassette, _cassette_loaded
+    if not _cassette_loaded:
+        _cassette_loaded = True
+        mode = os.getenv("AGENT_CASSETTE_MODE", "off").lower()
+        if mode in ("record", "replay"):
+            # Default name: '<agent folder>-<script>', e.g. '03_multi_tool_use-robust_agent'
+            script = os.path.abspath(sys.argv[0] or "interactive")
+            name = f"{os.path.basename(os.path.dirname(script))}-{os.path.splitext(os.path.basename(script))[0]}"
+            path = os.getenv("AGENT_CASSETTE") or os.path.join(CASSETTE_DIR, f"{name}.jsonl.gz")
+            _cassette = Cassette(path, mode, timing=os.getenv("AGENT_CASSETTE_TIMING", "0") == "1")
+            print(f"📼 Cassette {mode} mode: {path}")
+    return _cassette
+
+
+class _RecordingStream:
+    """Wraps a streaming response: passes the chunks through and records the ones that were consumed."""
+
+    def __init__(self, stream, cassette: Cassette, key: str, start: float):
+        self._stream = stream
+        self._cassette = cassette
+        self._key = key
+        self._start = start
+        self._chunks = []
+        self._recorded = False
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._chunks.append(chunk.model_dump(exclude_none=True))
+            yield chunk
+        self._record()
+
+    def close(self) -> None:
+        # A stream closed early (e.g. a tool action was found) is recorded up to that point
+        self._stream.close()
+        self._record()
+
+    def _record(self) -> None:
+        if not self._recorded:
+            self._recorded = True
+            self._cassette.record("chat", self._key, self._chunks, time.perf_counter() - self._start)
+
+
+class _ReplayStream:
+    """Serves recorded stream chunks as SDK chunk objects."""
+
+    def __init__(self, chunks: list):
+        self._chunks = chunks
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            yield ChatCompletionChunk.model_validate(chunk)
+
+    def close(self) -> None:
+        pass
+
+
+class _CassetteCompletions:
+    """Drop-in replacement for client.chat.completions that records or replays every call."""
+
+    def __init__(self, client, cassette: Cassette):
+        self._client = client
+        self._cassette = cassette
+
+    def create(self, **kwargs):
+        key = self._cassette.key("chat", kwargs)
+
+        # Streaming requests are recorded/replayed chunk by chunk
+        if kwargs.get("stream"):
+            if self._cassette.mode == "replay":
+                return _ReplayStream(self._cassette.replay("chat", key))
+            start = time.perf_counter()
+            return _RecordingStream(self._client.chat.completions.create(**kwargs), self._cassette, key, start)
+
+        # Replay: rebuild the SDK response object from the recorded JSON
+        if self._cassette.mode == "replay":
+            return ChatCompletion.model_validate(self._cassette.replay("chat", key))
+
+        # Record: make the real call and store its response
+        start = time.perf_counter()
+        response = self._client.chat.completions.create(**kwargs)
+        self._cassette.record("chat", key, response.model_dump(exclude_none=True), time.perf_counter() - start)
+        return response
+
+
+class CassetteClient:
+    """Wraps a Groq client (or nothing at all, in replay mode) with record/replay support."""
+
+    def __init__(self, client, cassette: Cassette):
+        self._client = client
+        self._cassette = cassette
+        self.chat = SimpleNamespace(completions=_CassetteCompletions(client, cassette))
+
+    def with_options(self, **options):
+        """Same as Groq.with_options, but keeps recording/replaying."""
+        client = self._client.with_options(**options) if self._client is not None else None
+        return CassetteClient(client, self._cassette)
+
+    def __getattr__(self, name):
+        # Anything we don't intercept goes to the real client
+        if self._client is None:
+            raise AttributeError(f"'{name}' is not available in cassette replay mode.")
+        return getattr(self._client, name)
+
+
+def recordable(func):
+    """Decorator for tools: records their results, or serves them from the cassette in replay mode."""
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        cassette = get_cassette()
+        if cassette is None:
+            return func(*args, **kwargs)
+
+        key = cassette.key(func.__name__, {"args": args, "kwargs": kwargs})
+        if cassette.mode == "replay":
+            return cassette.replay(func.__name__, key)
+
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        cassette.record(func.__name__, key, result, time.perf_counter() - start)
+        return result
+
+    return wrapper
@@ -1,13 +1,157 @@
 # common/client.py
 
+"""
+Groq Client Module
+
+get_groq_client() and get_async_groq_client() return ONE client per process, built on a shared
+httpx connection pool. Connections are kept alive between requests, so sessions, batch jobs and
+background summaries reuse them instead of paying a new TCP + TLS handshake every time.
+
+Configuration (environment variables):
+  GROQ_HTTP_MAX_CONNECTIONS  : max open connections in the pool (default: 20)
+  GROQ_HTTP_MAX_KEEPALIVE    : max idle connections kept alive (default: 10)
+  GROQ_HTTP_KEEPALIVE_EXPIRY : seconds an idle connection is kept (default: 60)
+  GROQ_HTTP_CONNECT_TIMEOUT  : connect timeout in seconds (default: 5)
+  GROQ_HTTP_READ_TIMEOUT     : read timeout in seconds (default: 60)
+  GROQ_HTTP2                 : 0 to disable HTTP/2 (only used if 'h2' is installed, default: 1)
+  GROQ_HTTP_METRICS          : 1 to print connection-reuse metrics on exit (default: 0)
+
+For tests or load runs against a local stand-in server, call configure_transport() first.
+"""
+
 # Import necessary libraries
 import os
+import atexit
+import threading
 from pathlib import Path
+import httpx
 from dotenv import load_dotenv
-from groq import Groq
+from groq import Groq, AsyncGroq
+from common.cassette import get_cassette, CassetteClient
+from common.hedging import hedged
+
+# Optional hedged requests (see common/hedging.py)
+HEDGE_ENABLED = os.getenv("GROQ_HEDGE", "0") == "1"
+
+# Shared HTTP transport settings (one connection pool for the whole process)
+HTTP_MAX_CONNECTIONS = int(os.getenv("GROQ_HTTP_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("GROQ_HTTP_MAX_KEEPALIVE", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("GROQ_HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("GROQ_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("GROQ_HTTP_READ_TIMEOUT", "60"))
+
+# HTTP/2 needs the optional 'h2' package (pip install h2) - fall back to HTTP/1.1 keep-alive without it
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+HTTP2_ENABLED = HTTP2_AVAILABLE and os.getenv("GROQ_HTTP2", "1") == "1"
+
+# Print the connection-reuse metrics when the program exits
+HTTP_METRICS_ENABLED = os.getenv("GROQ_HTTP_METRICS", "0") == "1"
+
+
+class ConnectionMetrics:
+    """Counts requests vs. new connections, to confirm that connections (and TLS handshakes) are reused."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.tls_handshakes = 0
+
+    def trace(self, event: str, info: dict) -> None:
+        """httpcore trace hook: called for every low-level connection event."""
+        with self._lock:
+            if event == "connection.connect_tcp.complete":
+                self.connections += 1
+            elif event == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+
+    def count_request(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def report(self) -> str:
+        reused = self.requests - self.connections
+        reuse_rate = reused / self.requests * 100 if self.requests else 0.0
+        return (f"🔌 HTTP: {self.requests} requests, {self.connections} new connections, "
+                f"{self.tls_handshakes} TLS handshakes, {max(reused, 0)} reused ({reuse_rate:.1f}%)")
+
+
+class _MetricsTransport(httpx.BaseTransport):
+    """Wraps the real transport and attaches the metrics trace hook to every request."""
+
+    def __init__(self, transport: httpx.BaseTransport, metrics: ConnectionMetrics):
+        self._transport = transport
+        self._metrics = metrics
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self._metrics.count_request()
+        request.extensions["trace"] = self._metrics.trace
+        return self._transport.handle_request(request)
+
+    def close(self) -> None:
+        self._transport.close()
 
-def get_groq_client():
-    """Get the Groq client with robust path handling"""
+
+class _AsyncMetricsTransport(httpx.AsyncBaseTransport):
+    """Async version of _MetricsTransport (httpcore awaits the trace hook)."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, metrics: ConnectionMetrics):
+        self._transport = transport
+        self._metrics = metrics
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self._metrics.count_request()
+
+        async def trace(event: str, info: dict) -> None:
+            self._metrics.trace(event, info)
+
+        request.extensions["trace"] = trace
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+# Process-wide state: one client (and connection pool) per process
+_lock = threading.Lock()
+_transport = None
+_async_transport = None
+_base_url = None
+_client = None
+_async_client = None
+metrics = ConnectionMetrics()
+
+if HTTP_METRICS_ENABLED:
+    atexit.register(lambda: print(metrics.report()))
+
+def configure_transport(transport: httpx.BaseTransport = None, async_transport: httpx.AsyncBaseTransport = None,
+                        base_url: str = None) -> None:
+    """
+    Injects a custom HTTP transport and/or base URL (e.g. a local stand-in server for load tests).
+    Must be called before the first get_groq_client() / get_async_groq_client() call to take effect;
+    it also drops the current shared clients so the next call builds new ones.
+    """
+    global _transport, _async_transport, _base_url, _client, _async_client
+    with _lock:
+        _transport, _async_transport, _base_url = transport, async_transport, base_url
+        _client, _async_client = None, None
+
+def _timeout() -> httpx.Timeout:
+    """Connect/read timeouts shared by both clients (per-request timeouts, e.g. from a Deadline, still win)."""
+    return httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+
+def _limits() -> httpx.Limits:
+    """Connection pool size and keep-alive settings."""
+    return httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                        max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+                        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
+
+def get_api_key() -> str:
+    """Get the Groq API key with robust path handling"""
 
     # 1. Check if the key is ALREADY in the environment (e.g., from Docker Compose)
     api_key = os.getenv("GROQ_API_KEY")
@@ -29,9 +173,47 @@ def get_groq_client():
     # 3. If the API key is still not found, raise an error
     if not api_key:
         raise ValueError("API Key not found! Make sure .env is in the root.")
-    
+
     # 4. Print API Key initialization status
     print("API Key initialized successfully!")
+    return api_key
+
+def get_groq_client():
+    """
+    Get the process-wide Groq client (optionally hedged and/or recorded).
+    Every caller shares the same keep-alive connection pool, so TLS handshakes are paid only once.
+    """
+    global _client
+    with _lock:
+        if _client is not None:
+            return _client
+
+        # 0. In cassette replay mode, no API key (or network) is needed at all
+        cassette = get_cassette()
+        if cassette and cassette.mode == "replay":
+            _client = CassetteClient(None, cassette)
+            return _client
+
+        # Create the shared HTTP client (keep-alive pool, HTTP/2 when available, connect/read timeouts)
+        transport = _transport or httpx.HTTPTransport(limits=_limits(), http2=HTTP2_ENABLED)
+        http_client = httpx.Client(transport=_MetricsTransport(transport, metrics), timeout=_timeout())
+
+        # Create the Groq client on top of it (hedged if enabled)
+        client = Groq(api_key=get_api_key(), base_url=_base_url, timeout=_timeout(), http_client=http_client)
+        if HEDGE_ENABLED:
+            client = hedged(client)
+
+        # Keep the client (wrapped for recording if a cassette is being recorded)
+        _client = CassetteClient(client, cassette) if cassette else client
+        return _client
 
-    # Return the Groq client
-    return Groq(api_key=api_key)
+def get_async_groq_client():
+    """Get the process-wide async Groq client (optionally hedged), with its own shared connection pool."""
+    global _async_client
+    with _lock:
+        if _async_client is None:
+            transport = _async_transport or httpx.AsyncHTTPTransport(limits=_limits(), http2=HTTP2_ENABLED)
+            http_client = httpx.AsyncClient(transport=_AsyncMetricsTransport(transport, metrics), timeout=_timeout())
+            client = AsyncGroq(api_key=get_api_key(), base_url=_base_url, timeout=_timeout(), http_client=http_client)
+            _async_client = hedged(client) if HEDGE_ENABLED else client
+        return _async_client
@@ -5,20 +5,43 @@ Database Module
 
 This module handles all interactions with the SQLite database.
 It provides functions to initialize the database, save messages, retrieve chat history, and clear history.
+It also provides a retention subsystem (purge, archive and vacuum) to keep the database file from growing forever.
 """
 
 # Import required libraries
 import sqlite3
 import os
+import json
+import time
+import zlib
+import argparse
+from typing import Optional
 
 # Ensure there is a 'data' directory at the project root - if not, create it
 DB_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "agents.db")
 os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
 
+# The database file actually used by this process (resolved on first use)
+_db_path = None
+
+def get_db_path() -> str:
+    """
+    Returns the database file to use: DB_PATH, unless a cassette is recording or replaying
+    (the database is then snapshotted / restored with the cassette, see common/cassette.py).
+    """
+    global _db_path
+    if _db_path is None:
+        if os.getenv("AGENT_CASSETTE_MODE", "off").lower() in ("record", "replay"):
+            from common.cassette import get_cassette
+            _db_path = get_cassette().database(DB_PATH)
+        else:
+            _db_path = DB_PATH
+    return _db_path
+
 def get_connection() -> sqlite3.Connection:
     """Returns a connection to the SQLite database."""
     # Connect to the database
-    conn = sqlite3.connect(DB_PATH)
+    conn = sqlite3.connect(get_db_path())
     # This allows us to access columns by name (e.g. row['role'])
     conn.row_factory = sqlite3.Row
     return conn
@@ -32,12 +55,33 @@ Table: chat_history
   role        : TEXT NOT NULL                     : Role (e.g. user, assistant, system)
   content     : TEXT NOT NULL                     : Content of the message
   timestamp   : DATETIME DEFAULT CURRENT_TIMESTAMP: Timestamp of the message
+
+Table: chat_history_archive
+  id             : INTEGER PRIMARY KEY AUTOINCREMENT : Auto-incrementing primary key
+  source_agent   : TEXT NOT NULL                     : Source agent name of the archived session
+  session_id     : TEXT NOT NULL                     : Session ID
+  message_count  : INTEGER NOT NULL                  : Number of messages in the archived chunk
+  first_timestamp: DATETIME                          : Timestamp of the oldest archived message
+  last_timestamp : DATETIME                          : Timestamp of the newest archived message
+  payload        : BLOB NOT NULL                     : zlib-compressed JSON list of the archived messages
+  archived_at    : DATETIME DEFAULT CURRENT_TIMESTAMP: When the chunk was archived
+
+Table: session_summary
+  session_id     : TEXT PRIMARY KEY                  : Session ID (one rolling summary per session)
+  source_agent   : TEXT NOT NULL                     : Source agent name
+  summary        : TEXT NOT NULL                     : Rolling summary of the older messages
+  last_message_id: INTEGER NOT NULL                  : Last chat_history id included in the summary
+  updated_at     : DATETIME DEFAULT CURRENT_TIMESTAMP: When the summary was last updated
 """
 def initialize_db() -> None:
     """Creates the necessary tables if they don't exist."""
     # Connect to the database and create a cursor
     conn = get_connection()
     cursor = conn.cursor()
+
+    # Let SQLite hand freed pages back to the OS with 'PRAGMA incremental_vacuum'
+    # (only takes effect on a brand-new database, see incremental_vacuum() for existing ones)
+    cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
     
     # Create a table for chat history
     cursor.execute("""
@@ -51,6 +95,36 @@ def initialize_db() -> None:
         )
     """)
 
+    # Indexes used by the session lookups and the retention jobs
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_session ON chat_history (session_id, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_agent_ts ON chat_history (source_agent, timestamp)")
+
+    # Create a table for archived (cold) sessions
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS chat_history_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            source_agent TEXT NOT NULL,
+            session_id TEXT NOT NULL,
+            message_count INTEGER NOT NULL,
+            first_timestamp DATETIME,
+            last_timestamp DATETIME,
+            payload BLOB NOT NULL,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_chat_history_archive_session ON chat_history_archive (session_id)")
+
+    # Create a table for the rolling session summaries
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS session_summary (
+            session_id TEXT PRIMARY KEY,
+            source_agent TEXT NOT NULL,
+            summary TEXT NOT NULL,
+            last_message_id INTEGER NOT NULL,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
     # Commit the changes and close the connection
     conn.commit()
     conn.close()
@@ -79,7 +153,7 @@ def get_chat_history(session_id: str, limit: int = 10) -> list[dict]:
     
     # Retrieve the last N messages for the session
     cursor.execute(
-        "SELECT role, content FROM chat_history WHERE session_id = ? ORDER BY timestamp DESC LIMIT ?",
+        "SELECT role, content FROM chat_history WHERE session_id = ? ORDER BY timestamp DESC, id DESC LIMIT ?",
         (session_id, limit)
     )
     # We reverse the list so it's in chronological order for the LLM
@@ -96,14 +170,251 @@ def clear_history(session_id: str) -> None:
     conn = get_connection()
     cursor = conn.cursor()
     
-    # Delete the chat history for the session
+    # Delete the chat history (and its summary) for the session
     cursor.execute("DELETE FROM chat_history WHERE session_id = ?", (session_id,))
+    cursor.execute("DELETE FROM session_summary WHERE session_id = ?", (session_id,))
     
     # Commit the changes and close the connection
     conn.commit()
     conn.close()
 
+def get_summary(session_id: str) -> Optional[dict]:
+    """Retrieves the rolling summary of a session (None if there is none yet)."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT summary, last_message_id FROM session_summary WHERE session_id = ?", (session_id,))
+    row = cursor.fetchone()
+    conn.close()
+    return {"summary": row["summary"], "last_message_id": row["last_message_id"]} if row else None
+
+def save_summary(source_agent: str, session_id: str, summary: str, last_message_id: int) -> None:
+    """Creates or replaces the rolling summary of a session."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """INSERT INTO session_summary (session_id, source_agent, summary, last_message_id)
+           VALUES (?, ?, ?, ?)
+           ON CONFLICT(session_id) DO UPDATE SET
+               summary = excluded.summary,
+               last_message_id = excluded.last_message_id,
+               updated_at = CURRENT_TIMESTAMP""",
+        (session_id, source_agent, summary, last_message_id)
+    )
+    conn.commit()
+    conn.close()
+
+def get_unsummarized_messages(session_id: str, after_id: int, window: int = 10) -> list[dict]:
+    """
+    Retrieves the messages that are not summarized yet (id > after_id)
+    and have already left the recent window (everything except the last 'window' messages).
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT id, role, content FROM chat_history
+           WHERE session_id = ? AND id > ? AND id NOT IN (
+               SELECT id FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?
+           )
+           ORDER BY id""",
+        (session_id, after_id, session_id, window)
+    )
+    rows = cursor.fetchall()
+    conn.close()
+    return [{"id": row["id"], "role": row["role"], "content": row["content"]} for row in rows]
+
+def get_context_messages(session_id: str, after_id: int, window: int = 10) -> list[dict]:
+    """
+    Retrieves every message the summary does not cover yet (id > after_id),
+    and at least the last 'window' messages, in chronological order.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """SELECT role, content FROM chat_history
+           WHERE session_id = ? AND (id > ? OR id IN (
+               SELECT id FROM chat_history WHERE session_id = ? ORDER BY id DESC LIMIT ?
+           ))
+           ORDER BY id""",
+        (session_id, after_id, session_id, window)
+    )
+    rows = cursor.fetchall()
+    conn.close()
+    return [{"role": row["role"], "content": row["content"]} for row in rows]
+
+# --- RETENTION SUBSYSTEM ---
+
+# Default retention (in days) per source_agent, '*' applies to every agent not listed explicitly
+RETENTION_DAYS = {"*": 90}
+
+# Sessions with no new message for this many days are moved to the archive table
+ARCHIVE_AFTER_DAYS = 30
+
+# Rows (or sessions) handled per transaction, so we never hold the write lock for long
+BATCH_SIZE = 500
+
+def purge_old_messages(retention: dict[str, int] = None, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Deletes messages older than the retention period of their source_agent.
+    Deletes run in small batches, each in its own short transaction.
+    Returns the number of deleted rows.
+    """
+    retention = retention or RETENTION_DAYS
+    explicit_agents = [agent for agent in retention if agent != "*"]
+
+    # Build one (filter, params) pair per retention rule
+    rules = [("source_agent = ?", [agent], days) for agent, days in retention.items() if agent != "*"]
+    if "*" in retention:
+        placeholders = ", ".join("?" for _ in explicit_agents)
+        where = f"source_agent NOT IN ({placeholders})" if explicit_agents else "1 = 1"
+        rules.append((where, explicit_agents, retention["*"]))
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    deleted = 0
+
+    for where, params, days in rules:
+        while True:
+            # Delete one batch of expired rows and release the lock right away
+            cursor.execute(
+                f"""DELETE FROM chat_history WHERE id IN (
+                        SELECT id FROM chat_history
+                        WHERE {where} AND timestamp < datetime('now', ?)
+                        LIMIT ?
+                    )""",
+                (*params, f"-{int(days)} days", batch_size)
+            )
+            conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+
+    conn.close()
+    return deleted
+
+def archive_cold_sessions(idle_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Moves sessions that have been idle for 'idle_days' into the compressed archive table.
+    Each session is archived in chunks of 'batch_size' messages, one short transaction per chunk.
+    Returns the number of archived sessions.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+
+    # Find the cold sessions (the newest message is older than the cut-off)
+    cursor.execute(
+        """SELECT source_agent, session_id FROM chat_history
+           GROUP BY source_agent, session_id
+           HAVING MAX(timestamp) < datetime('now', ?)""",
+        (f"-{int(idle_days)} days",)
+    )
+    sessions = cursor.fetchall()
+
+    for session in sessions:
+        while True:
+            # Read the oldest chunk of the session
+            cursor.execute(
+                """SELECT id, role, content, timestamp FROM chat_history
+                   WHERE source_agent = ? AND session_id = ?
+                   ORDER BY id LIMIT ?""",
+                (session["source_agent"], session["session_id"], batch_size)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            # Compress the chunk and move it in a single transaction
+            payload = zlib.compress(json.dumps(
+                [{"role": row["role"], "content": row["content"], "timestamp": row["timestamp"]} for row in rows]
+            ).encode("utf-8"))
+            cursor.execute(
+                """INSERT INTO chat_history_archive
+                   (source_agent, session_id, message_count, first_timestamp, last_timestamp, payload)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (session["source_agent"], session["session_id"], len(rows),
+                 rows[0]["timestamp"], rows[-1]["timestamp"], payload)
+            )
+            cursor.execute(
+                "DELETE FROM chat_history WHERE id BETWEEN ? AND ? AND session_id = ? AND source_agent = ?",
+                (rows[0]["id"], rows[-1]["id"], session["session_id"], session["source_agent"])
+            )
+            conn.commit()
+
+    conn.close()
+    return len(sessions)
+
+def get_archived_history(session_id: str) -> list[dict]:
+    """Retrieves (and decompresses) the archived messages of a session in chronological order."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT payload FROM chat_history_archive WHERE session_id = ? ORDER BY id", (session_id,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    history = []
+    for row in rows:
+        history.extend(json.loads(zlib.decompress(row["payload"]).decode("utf-8")))
+    return history
+
+def incremental_vacuum(pages: int = 0) -> int:
+    """
+    Returns free pages to the OS ('pages' = 0 frees all of them).
+    Databases created before auto_vacuum was enabled are converted once with a full VACUUM.
+    Returns the number of freed pages.
+    """
+    # isolation_level=None: VACUUM and incremental_vacuum cannot run inside a transaction
+    conn = sqlite3.connect(get_db_path(), isolation_level=None)
+    cursor = conn.cursor()
+    free_before = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+
+    # auto_vacuum: 0 = NONE, 1 = FULL, 2 = INCREMENTAL
+    if cursor.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+        cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        cursor.execute("VACUUM")
+    else:
+        cursor.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+
+    free_after = cursor.execute("PRAGMA freelist_count").fetchone()[0]
+    conn.close()
+    return max(free_before - free_after, 0)
+
+def _parse_retention(value: str) -> tuple[str, int]:
+    """Parses one CLI '--keep agent=days' value (used as the argparse 'type', so errors become usage errors)."""
+    agent, _, days = value.partition("=")
+    if not agent or not days.isdigit():
+        raise argparse.ArgumentTypeError(f"Invalid retention '{value}', expected AGENT=DAYS (e.g. 04_memory_agent=30)")
+    return agent, int(days)
+
+def _timed(label: str, func, *args) -> None:
+    """Runs a maintenance step and prints how long it took."""
+    start = time.perf_counter()
+    result = func(*args)
+    outcome = f": {result}" if result is not None else ""
+    print(f"✅ {label}{outcome} ({time.perf_counter() - start:.3f}s)")
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Initialize and maintain the agents database.")
+    parser.add_argument("command", nargs="?", default="init",
+                        choices=["init", "purge", "archive", "vacuum", "maintain"],
+                        help="init (default): create tables | purge: apply retention | archive: move cold sessions "
+                             "| vacuum: incremental vacuum | maintain: purge + archive + vacuum")
+    parser.add_argument("--keep", action="append", default=[], type=_parse_retention, metavar="AGENT=DAYS",
+                        help="Retention per source_agent, '*' for all others (repeatable). "
+                             "Added on top of the defaults (*=90), so other agents keep the '*' rule")
+    parser.add_argument("--archive-after", type=int, default=ARCHIVE_AFTER_DAYS, metavar="DAYS",
+                        help=f"Archive sessions idle for this many days (default: {ARCHIVE_AFTER_DAYS})")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE,
+                        help=f"Rows/sessions per transaction (default: {BATCH_SIZE})")
+    args = parser.parse_args()
+
     print("🚀 Initializing Database...")
-    initialize_db()
-    print(f"✅ Database ready at {DB_PATH}")
\ No newline at end of file
+    _timed("Database ready", initialize_db)
+    print(f"📁 {DB_PATH}")
+
+    if args.command in ("purge", "maintain"):
+        # User rules override the defaults for the agents they name; the '*' rule still covers the rest
+        retention = {**RETENTION_DAYS, **dict(args.keep)}
+        _timed(f"Purged messages (retention {retention})", purge_old_messages, retention, args.batch_size)
+    if args.command in ("archive", "maintain"):
+        _timed(f"Archived sessions (idle > {args.archive_after} days)", archive_cold_sessions, args.archive_after, args.batch_size)
+    if args.command in ("vacuum", "maintain"):
+        _timed("Freed pages", incremental_vacuum)
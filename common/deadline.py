@@ -0,0 +1,166 @@
+# common/deadline.py
+
+"""
+Deadline Module
+
+The agent loops cap the number of iterations, but not the wall time: one slow search or a
+long completion can keep the user waiting forever. A Deadline is a single time budget per
+user query that is threaded through the loop:
+
+- every Groq call gets the remaining time as its request timeout,
+- every tool call is abandoned when the budget runs out,
+- transient API errors (rate limits, server errors) are retried only while the budget allows,
+- a small reserve is kept aside to write a best-effort final answer from what we have so far.
+
+Configure it with AGENT_QUERY_DEADLINE (seconds per query) and AGENT_ANSWER_RESERVE (seconds
+kept for the final answer).
+"""
+
+# Import required libraries
+import os
+import time
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from groq import APITimeoutError, APIConnectionError, RateLimitError, InternalServerError
+
+# Total time budget per user query (in seconds)
+QUERY_DEADLINE = float(os.getenv("AGENT_QUERY_DEADLINE", "30"))
+
+# Part of the budget reserved for the best-effort final answer (in seconds)
+ANSWER_RESERVE = float(os.getenv("AGENT_ANSWER_RESERVE", "5"))
+
+# Never send a request with a timeout shorter than this (in seconds)
+MIN_TIMEOUT = 0.5
+
+# Retries of transient API errors (rate limits, 5xx, dropped connections) within the budget
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.5
+RETRY_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+
+# Tools run on these threads so we can stop waiting for them when the time is up
+_tool_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="deadline-tool")
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the time budget of a query runs out."""
+
+
+# Errors that mean "the time budget ran out" (our own, or a Groq request hitting its timeout)
+TIMEOUT_ERRORS = (DeadlineExceeded, APITimeoutError)
+
+
+class Deadline:
+    """A wall-clock budget for a single user query."""
+
+    def __init__(self, seconds: float = QUERY_DEADLINE, reserve: float = ANSWER_RESERVE):
+        # Never reserve more than half of the budget for the final answer
+        self.reserve = min(reserve, seconds / 2)
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Time left for the loop itself (the answer reserve is not included)."""
+        return max(self.expires_at - self.reserve - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """True once the loop has used up its share of the budget."""
+        return self.remaining() <= 0
+
+    def timeout(self) -> float:
+        """Request timeout for the next call of the loop. Raises DeadlineExceeded if there is no time left."""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Query deadline exceeded.")
+        return max(remaining, MIN_TIMEOUT)
+
+    def answer_timeout(self) -> float:
+        """Request timeout for the best-effort final answer (uses the reserve as well)."""
+        return max(self.expires_at - time.monotonic(), MIN_TIMEOUT)
+
+
+class _DeadlineCompletions:
+    """client.chat.completions with retries that stay inside the request's timeout."""
+
+    def __init__(self, completions):
+        self._completions = completions
+
+    def create(self, **kwargs):
+        # The 'timeout' of the request is the time left in the budget: retries have to fit into it
+        timeout = kwargs.get("timeout")
+        start = time.monotonic()
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return self._completions.create(**kwargs)
+            except APITimeoutError:
+                # The budget is used up - retrying would only overrun it
+                raise
+            except RETRY_ERRORS:
+                delay = RETRY_BACKOFF * 2 ** attempt
+                if attempt == MAX_RETRIES:
+                    raise
+                if isinstance(timeout, (int, float)):
+                    left = timeout - (time.monotonic() - start) - delay
+                    if left < MIN_TIMEOUT:
+                        raise
+                    kwargs["timeout"] = left
+                time.sleep(delay)
+
+
+class DeadlineClient:
+    """
+    Wraps a Groq client for deadline-bound agents.
+    The SDK's own retries are turned off (each attempt would get the full timeout again, silently
+    multiplying the budget); rate limits, server errors and dropped connections are retried here
+    instead, with a short backoff, as long as the remaining time allows. Timeouts are never retried.
+    """
+
+    def __init__(self, client):
+        self._client = client.with_options(max_retries=0)
+        self.chat = SimpleNamespace(completions=_DeadlineCompletions(self._client.chat.completions))
+
+    def with_options(self, **options):
+        return DeadlineClient(self._client.with_options(**options))
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def deadline_client(client) -> DeadlineClient:
+    """Returns the client with retries bounded by the per-query time budget (see DeadlineClient)."""
+    return DeadlineClient(client)
+
+
+def run_with_deadline(deadline: Deadline, func, *args, **kwargs):
+    """
+    Runs a tool call, but stops waiting for it when the deadline expires.
+    Python threads cannot be killed, so a tool that overruns is abandoned (its result is ignored).
+    """
+    future = _tool_executor.submit(func, *args, **kwargs)
+    try:
+        return future.result(timeout=deadline.timeout())
+    except FutureTimeoutError:
+        # Cancel it if it has not started yet, otherwise just abandon it
+        future.cancel()
+        raise DeadlineExceeded(f"Tool '{getattr(func, '__name__', func)}' did not finish before the deadline.")
+
+
+def best_effort_answer(client, model: str, messages: list, deadline: Deadline, **request_options) -> str:
+    """
+    Produces a final answer when the budget has run out, using only the observations gathered so far.
+    'request_options' are passed to the API (e.g. the tool schema with tool_choice="none" for native tool agents).
+    Falls back to a plain message if even that call cannot be completed in time.
+    """
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages + [{
+                "role": "user",
+                "content": "Time is up: do not use any tools. Give your best final answer now, "
+                           "using only the information gathered so far, and say what is still uncertain."
+            }],
+            max_tokens=512,
+            timeout=deadline.answer_timeout(),
+            **request_options
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        return f"Sorry, I ran out of time before I could finish this answer ({str(e)})."
@@ -0,0 +1,245 @@
+# common/hedging.py
+
+"""
+Hedged Requests Module
+
+A few slow Groq completions dominate the tail latency (p99) of the agents. Hedging fights the
+tail: if a request has not come back after the usual latency (a percentile of the recent
+requests), one duplicate request is sent - optionally to an alternate model - and whichever
+answer arrives first wins. The other one is cancelled (async client) or abandoned (sync client).
+
+Limitation of the sync client: a blocking request cannot be interrupted, so the losing request
+keeps its thread and its pooled connection until the server answers (and its tokens are still
+generated); the late response is then closed and dropped. Use the async client for real cancellation.
+
+Only slow requests are duplicated, so the extra load stays around (100 - percentile)%.
+
+Configuration (environment variables, used by common/client.py):
+  GROQ_HEDGE            : 1 to enable hedging (default: 0)
+  GROQ_HEDGE_PERCENTILE : latency percentile after which a hedge is sent (default: 95)
+  GROQ_HEDGE_MODEL      : alternate model for the hedge request (default: same model)
+"""
+
+# Import required libraries
+import os
+import time
+import atexit
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from types import SimpleNamespace
+
+# Latency percentile after which a duplicate request is sent
+HEDGE_PERCENTILE = float(os.getenv("GROQ_HEDGE_PERCENTILE", "95"))
+
+# Alternate model for the hedge request (None = same model as the original request)
+HEDGE_MODEL = os.getenv("GROQ_HEDGE_MODEL") or None
+
+# Until we have seen this many requests, hedge after a fixed delay instead
+MIN_SAMPLES = 20
+INITIAL_HEDGE_DELAY = 3.0
+
+# How many recent latencies are used to compute the percentile
+WINDOW_SIZE = 200
+
+
+class LatencyTracker:
+    """Keeps a sliding window of recent request latencies and computes the hedge delay."""
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, window: int = WINDOW_SIZE):
+        self.percentile = percentile
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def hedge_delay(self) -> float:
+        """How long to wait for the original request before sending the hedge."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < MIN_SAMPLES:
+            return INITIAL_HEDGE_DELAY
+        index = min(int(len(samples) * self.percentile / 100), len(samples) - 1)
+        return samples[index]
+
+
+class HedgeStats:
+    """Counters to see how often we hedge and whether it pays off."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def count(self, hedged: bool = False, hedge_won: bool = False) -> None:
+        with self._lock:
+            self.requests += 1
+            self.hedged += hedged
+            self.hedge_wins += hedge_won
+
+    def report(self) -> str:
+        hedge_rate = self.hedged / self.requests * 100 if self.requests else 0.0
+        win_rate = self.hedge_wins / self.hedged * 100 if self.hedged else 0.0
+        return (f"📈 Hedging: {self.requests} requests, {self.hedged} hedged ({hedge_rate:.1f}%), "
+                f"hedge won {self.hedge_wins} ({win_rate:.1f}% of hedges)")
+
+
+def _discard(future) -> None:
+    """Done-callback for an abandoned request: closes the late response (if any) and drops it."""
+    if not future.cancelled() and future.exception() is None:
+        response = future.result()
+        if hasattr(response, "close"):
+            response.close()
+
+
+def _hedge_request(kwargs: dict, elapsed: float, hedge_model: str) -> dict:
+    """Builds the duplicate request: alternate model (if any) and only the time that is left."""
+    kwargs = dict(kwargs)
+    if hedge_model:
+        kwargs["model"] = hedge_model
+    if isinstance(kwargs.get("timeout"), (int, float)):
+        kwargs["timeout"] = max(kwargs["timeout"] - elapsed, 0.1)
+    return kwargs
+
+
+class _HedgedCompletions:
+    """Hedged replacement for client.chat.completions (sync client)."""
+
+    def __init__(self, completions, tracker: LatencyTracker, stats: HedgeStats, hedge_model: str):
+        self._completions = completions
+        self._tracker = tracker
+        self._stats = stats
+        self._hedge_model = hedge_model
+        self._executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="groq-hedge")
+
+    def create(self, **kwargs):
+        # Streams are consumed incrementally by the caller, so they are not hedged
+        if kwargs.get("stream"):
+            return self._completions.create(**kwargs)
+
+        start = time.perf_counter()
+        primary = self._executor.submit(self._completions.create, **kwargs)
+
+        # Fast path: the original request came back in time (or failed) - no hedge needed
+        done, _ = wait([primary], timeout=self._tracker.hedge_delay())
+        if done:
+            self._stats.count()
+            response = primary.result()
+            self._tracker.record(time.perf_counter() - start)
+            return response
+
+        # Slow path: send the hedge and take whichever finishes first (with a successful answer)
+        hedge_start = time.perf_counter()
+        hedge = self._executor.submit(
+            self._completions.create, **_hedge_request(kwargs, hedge_start - start, self._hedge_model))
+        pending, first_error = {primary, hedge}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    first_error = first_error or future.exception()
+                    continue
+                # Winner found: abandon the other request (a running thread cannot be interrupted,
+                # so its response is closed and dropped as soon as it arrives)
+                for loser in pending:
+                    if not loser.cancel():
+                        loser.add_done_callback(_discard)
+                hedge_won = future is hedge
+                self._stats.count(hedged=True, hedge_won=hedge_won)
+                # Record the latency the caller saw (not the hedge's own), or the hedge delay would keep shrinking
+                self._tracker.record(time.perf_counter() - start)
+                return future.result()
+
+        # Both requests failed
+        self._stats.count(hedged=True)
+        raise first_error
+
+
+class _AsyncHedgedCompletions:
+    """Hedged replacement for client.chat.completions (async client)."""
+
+    def __init__(self, completions, tracker: LatencyTracker, stats: HedgeStats, hedge_model: str):
+        self._completions = completions
+        self._tracker = tracker
+        self._stats = stats
+        self._hedge_model = hedge_model
+
+    async def create(self, **kwargs):
+        # Streams are consumed incrementally by the caller, so they are not hedged
+        if kwargs.get("stream"):
+            return await self._completions.create(**kwargs)
+
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(self._completions.create(**kwargs))
+
+        # Fast path: the original request came back in time (or failed) - no hedge needed
+        done, _ = await asyncio.wait({primary}, timeout=self._tracker.hedge_delay())
+        if done:
+            self._stats.count()
+            response = primary.result()
+            self._tracker.record(time.perf_counter() - start)
+            return response
+
+        # Slow path: send the hedge and take whichever finishes first (with a successful answer)
+        hedge_start = time.perf_counter()
+        hedge = asyncio.ensure_future(
+            self._completions.create(**_hedge_request(kwargs, hedge_start - start, self._hedge_model)))
+        pending, first_error = {primary, hedge}, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        first_error = first_error or task.exception()
+                        continue
+                    hedge_won = task is hedge
+                    self._stats.count(hedged=True, hedge_won=hedge_won)
+                    # Record the latency the caller saw (not the hedge's own), or the hedge delay would keep shrinking
+                    self._tracker.record(time.perf_counter() - start)
+                    return task.result()
+        finally:
+            # Cancel the loser (this really aborts its HTTP request)
+            for task in pending:
+                task.cancel()
+
+        # Both requests failed
+        self._stats.count(hedged=True)
+        raise first_error
+
+
+class HedgedClient:
+    """
+    Wraps a Groq or AsyncGroq client so that chat.completions.create is hedged.
+    Everything else is passed through to the wrapped client.
+    """
+
+    def __init__(self, client, percentile: float = HEDGE_PERCENTILE, hedge_model: str = HEDGE_MODEL,
+                 tracker: LatencyTracker = None, stats: HedgeStats = None):
+        self._client = client
+        self._hedge_model = hedge_model
+        self.tracker = tracker or LatencyTracker(percentile)
+        self.stats = stats or HedgeStats()
+
+        # Pick the sync or async implementation based on the wrapped client
+        completions = client.chat.completions
+        hedged_class = _AsyncHedgedCompletions if asyncio.iscoroutinefunction(completions.create) else _HedgedCompletions
+        self.chat = SimpleNamespace(completions=hedged_class(completions, self.tracker, self.stats, hedge_model))
+
+    def with_options(self, **options):
+        """Same as Groq.with_options; the copy shares the latency window and the statistics."""
+        return HedgedClient(self._client.with_options(**options), hedge_model=self._hedge_model,
+                            tracker=self.tracker, stats=self.stats)
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def hedged(client) -> HedgedClient:
+    """Wraps a client with hedging and prints the hedge statistics when the program exits."""
+    hedged_client = HedgedClient(client)
+    atexit.register(lambda: print(hedged_client.stats.report()))
+    return hedged_client
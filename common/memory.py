@@ -0,0 +1,101 @@
+# common/memory.py
+
+"""
+Summary Memory Module
+
+The memory-aware agent only sends the last N messages to the LLM; everything older used to
+be forgotten. SummaryMemory adds a second, cheaper tier:
+
+- Recent window : the last N messages, verbatim (from chat_history).
+- Rolling summary: ONE summary per session (table session_summary) covering everything older.
+
+The summary is updated incrementally in a background thread: once enough messages have left
+the recent window, only those new messages (the "delta") are folded into the existing summary.
+Until then (and while an update is running) the delta is sent verbatim along with the window,
+so no message is ever missing from the prompt. The prompt size stays bounded (at most about
+window + 2 * update_every messages), while long-term recall is kept.
+"""
+
+# Import required libraries
+import threading
+
+from common.database import get_summary, save_summary, get_unsummarized_messages, get_context_messages
+
+SUMMARY_PROMPT = """
+You maintain the long-term memory of a conversation between a user and an assistant.
+Update the running summary with the new messages below. Keep every durable fact about the user
+(name, preferences, plans, decisions, open questions) and drop small talk.
+Answer with the updated summary only, in at most 200 words.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+"""
+
+
+class SummaryMemory:
+    """Recent-window + rolling-summary memory for one session."""
+
+    def __init__(self, client, model: str, source_agent: str, session_id: str,
+                 window: int = 10, update_every: int = 6):
+        self.client = client
+        self.model = model
+        self.source_agent = source_agent
+        self.session_id = session_id
+        self.window = window
+        self.update_every = update_every
+        self._worker = None
+
+    def context(self) -> list[dict]:
+        """
+        The memory part of the prompt: the rolling summary (if any), followed by every message it
+        does not cover yet - the recent window plus any delta still waiting to be summarized.
+        """
+        messages = []
+        summary = get_summary(self.session_id)
+        if summary:
+            messages.append({
+                "role": "system",
+                "content": f"Summary of the earlier conversation with this user:\n{summary['summary']}"
+            })
+        last_id = summary["last_message_id"] if summary else 0
+        messages.extend(get_context_messages(self.session_id, last_id, self.window))
+        return messages
+
+    def maybe_update(self) -> None:
+        """Starts a background summary update if enough messages have left the recent window."""
+        # Only one update at a time - the next call will pick up whatever is left
+        if self._worker and self._worker.is_alive():
+            return
+        summary = get_summary(self.session_id)
+        last_id = summary["last_message_id"] if summary else 0
+        delta = get_unsummarized_messages(self.session_id, last_id, self.window)
+        if len(delta) < self.update_every:
+            return
+        self._worker = threading.Thread(
+            target=self._update, args=(summary["summary"] if summary else "", delta), daemon=True)
+        self._worker.start()
+
+    def _update(self, summary: str, delta: list[dict]) -> None:
+        """Folds the delta into the summary (runs in the background thread)."""
+        try:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": SUMMARY_PROMPT.format(
+                    summary=summary or "(empty)",
+                    messages="\n".join(f"{m['role']}: {m['content']}" for m in delta)
+                )}],
+                max_tokens=400
+            )
+            save_summary(self.source_agent, self.session_id,
+                         response.choices[0].message.content.strip(), delta[-1]["id"])
+        except Exception as e:
+            # A failed update is not fatal: the same delta will be retried after the next message
+            print(f"\n⚠️ Summary update failed: {str(e)}")
+
+    def wait(self, timeout: float = None) -> None:
+        """Waits for a running summary update (e.g. before exiting)."""
+        if self._worker:
+            self._worker.join(timeout)
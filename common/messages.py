@@ -0,0 +1,253 @@
+# common/messages.py
+
+"""
+Message Store Module
+
+The robust agents used to keep raw SDK response objects (heavy pydantic models) in their
+history, and the SDK had to convert all of them again on every request. The MessageStore
+keeps the conversation lean:
+
+- every message is converted ONCE into a small '__slots__' record (SDK objects included),
+- the API payload (a plain list of dicts) is built incrementally and reused on every request,
+- request() hands that payload to the SDK as 'extra_body', which is only JSON-encoded: the
+  SDK's own per-request walk over 'messages=' (the slowest part of building a request with
+  a long history) is skipped. The JSON sent is the same as with 'messages=payload()'.
+
+Run this file to benchmark it against a plain list of SDK objects (memory, and the time to
+send one request through a real Groq client over a stand-in transport):
+    python3 common/messages.py
+"""
+
+# Import required libraries
+import sys
+import json
+
+
+class Message:
+    """A single chat message, stored with '__slots__' (no per-instance __dict__)."""
+
+    __slots__ = ("role", "content", "name", "tool_call_id", "tool_calls", "_payload")
+
+    def __init__(self, role: str, content: str = None, name: str = None,
+                 tool_call_id: str = None, tool_calls: tuple = None):
+        # Roles and tool names repeat all the time - intern them so they are stored only once
+        self.role = sys.intern(role)
+        self.content = content
+        self.name = sys.intern(name) if name else None
+        self.tool_call_id = tool_call_id
+        self.tool_calls = tool_calls
+        self._payload = None
+
+    @classmethod
+    def from_any(cls, message) -> "Message":
+        """Converts a dict or an SDK message object (e.g. response.choices[0].message) into a Message."""
+        if isinstance(message, Message):
+            return message
+        if isinstance(message, dict):
+            get = message.get
+        else:
+            get = lambda key: getattr(message, key, None)
+
+        # Keep only what the API needs from each tool call
+        tool_calls = None
+        if get("tool_calls"):
+            tool_calls = tuple(
+                (call["id"], sys.intern(call["function"]["name"]), call["function"]["arguments"])
+                if isinstance(call, dict) else
+                (call.id, sys.intern(call.function.name), call.function.arguments)
+                for call in get("tool_calls")
+            )
+        return cls(get("role"), get("content"), get("name"), get("tool_call_id"), tool_calls)
+
+    def payload(self) -> dict:
+        """The message as the API expects it (built once, then cached)."""
+        if self._payload is None:
+            payload = {"role": self.role}
+            if self.content is not None or not self.tool_calls:
+                payload["content"] = self.content or ""
+            if self.name:
+                payload["name"] = self.name
+            if self.tool_call_id:
+                payload["tool_call_id"] = self.tool_call_id
+            if self.tool_calls:
+                payload["tool_calls"] = [
+                    {"id": call_id, "type": "function", "function": {"name": name, "arguments": arguments}}
+                    for call_id, name, arguments in self.tool_calls
+                ]
+            self._payload = payload
+        return self._payload
+
+
+# Result of the one-time 'extra_body' check (None = not checked yet)
+_extra_body_ok = None
+
+def extra_body_supported() -> bool:
+    """
+    MessageStore.request() relies on an SDK detail: 'extra_body' is merged over the request body
+    (a shallow {**body, **extra_body}), so its 'messages' replaces the empty placeholder.
+    This checks it ONCE per process - two requests with sample messages through a real Groq client on
+    a stand-in transport - and only says yes if the body sent is exactly the one 'messages=' sends.
+    If an SDK upgrade ever changes this, request() falls back to plain 'messages=' instead of breaking.
+    """
+    global _extra_body_ok
+    if _extra_body_ok is None:
+        import httpx
+        from groq import Groq
+
+        sample = [
+            {"role": "user", "content": "What is 6 * 7?"},
+            {"role": "assistant", "tool_calls": [{"id": "call_1", "type": "function",
+                                                  "function": {"name": "calculator", "arguments": "{}"}}]},
+            {"role": "tool", "tool_call_id": "call_1", "name": "calculator", "content": "42"},
+        ]
+        reply = {"id": "check", "object": "chat.completion", "created": 0, "model": "check", "choices": [
+            {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}]}
+        bodies = []
+        def handler(request):
+            bodies.append(json.loads(request.content))
+            return httpx.Response(200, json=reply)
+
+        try:
+            with httpx.Client(transport=httpx.MockTransport(handler)) as http_client:
+                client = Groq(api_key="check", base_url="http://check.local", http_client=http_client, max_retries=0)
+                client.chat.completions.create(model="check", messages=sample)
+                client.chat.completions.create(model="check", messages=[], extra_body={"messages": sample})
+            _extra_body_ok = len(bodies) == 2 and bodies[0] == bodies[1]
+        except Exception:
+            _extra_body_ok = False
+        if not _extra_body_ok:
+            print("⚠️ This SDK version does not merge 'extra_body' as expected - sending messages the regular way.")
+    return _extra_body_ok
+
+
+class MessageStore:
+    """
+    The conversation history of an agent.
+    Use it like a list of messages: append()/extend() accept dicts or SDK message objects,
+    and request() gives the arguments to send it: client.chat.completions.create(**messages.request(), ...).
+    """
+
+    __slots__ = ("_messages", "_payload")
+
+    def __init__(self, messages: list = None):
+        self._messages = []
+        self._payload = []
+        self.extend(messages or [])
+        # Run the one-time SDK check now (agent startup), not inside the first timed request
+        extra_body_supported()
+
+    def append(self, message) -> None:
+        """Adds a message (converted once into a compact record)."""
+        record = Message.from_any(message)
+        self._messages.append(record)
+        self._payload.append(record.payload())
+
+    def extend(self, messages) -> None:
+        """Adds several messages."""
+        for message in messages:
+            self.append(message)
+
+    def pop(self, index: int = -1) -> Message:
+        """Removes and returns a message (the last one by default)."""
+        self._payload.pop(index)
+        return self._messages.pop(index)
+
+    def payload(self) -> list[dict]:
+        """The API payload: the same list object is updated incrementally, nothing is rebuilt."""
+        return self._payload
+
+    def request(self) -> dict:
+        """
+        The conversation as chat.completions.create arguments.
+        The payload goes in 'extra_body', which the SDK sends as it is: the messages were already
+        converted once when they were added, so they are not walked and re-validated on every request.
+        This depends on how the SDK merges 'extra_body' (checked once, see extra_body_supported());
+        if the check fails, the plain 'messages=' arguments are returned instead.
+        """
+        if not extra_body_supported():
+            return {"messages": self._payload}
+        return {"messages": [], "extra_body": {"messages": self._payload}}
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __iter__(self):
+        return iter(self._messages)
+
+    def __getitem__(self, index):
+        return self._messages[index]
+
+
+def _benchmark(turns: int = 1000, sample_every: int = 50) -> None:
+    """
+    Compares a plain list of SDK objects with the MessageStore over N agent turns.
+    Request time is measured the way the agents send it: a real Groq client on a stand-in transport,
+    so the SDK builds and encodes the request body as usual (every 'sample_every' turns).
+    """
+    import time
+    import tracemalloc
+    import httpx
+    from groq import Groq
+    from groq.types.chat import ChatCompletionMessage
+
+    def make_turn(i: int):
+        # One agent turn: user question, tool call, tool result, final answer
+        call = {"id": f"call_{i}", "type": "function",
+                "function": {"name": "search_web", "arguments": json.dumps({"query": f"question {i}"})}}
+        return [
+            {"role": "user", "content": f"Question number {i}: what is the price of item {i}?"},
+            ChatCompletionMessage.model_validate({"role": "assistant", "content": None, "tool_calls": [call]}),
+            {"role": "tool", "tool_call_id": f"call_{i}", "name": "search_web", "content": "Result snippet. " * 20},
+            ChatCompletionMessage.model_validate({"role": "assistant", "content": f"Item {i} costs ${i}.99."}),
+        ]
+
+    # A real client whose transport answers locally (no network), recording the body size it was sent
+    reply = {"id": "bench", "object": "chat.completion", "created": 0, "model": "bench", "choices": [
+        {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "ok"}}]}
+    sent = []
+    def handler(request):
+        sent.append(len(request.content))
+        return httpx.Response(200, json=reply)
+    client = Groq(api_key="benchmark", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+
+    def send_raw(history: list) -> None:
+        # What the agents did before: the SDK converts and validates every message again
+        client.chat.completions.create(model="bench", messages=history)
+
+    def send_store(history: MessageStore) -> None:
+        client.chat.completions.create(model="bench", **history.request())
+
+    results = {}
+
+    for label in ("list of SDK objects", "MessageStore"):
+        new_history = list if label == "list of SDK objects" else MessageStore
+        send = send_raw if label == "list of SDK objects" else send_store
+
+        # 1. Memory: build the history under tracemalloc
+        # (the SDK objects are created here, as the API would; only the history decides what is kept alive)
+        tracemalloc.start()
+        history = new_history()
+        for i in range(turns):
+            history.extend(make_turn(i))
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # 2. Requests: send the whole history so far, as the agents do on every turn
+        history = new_history()
+        request_times = []
+        for i in range(turns):
+            history.extend(make_turn(i))
+            if (i + 1) % sample_every == 0:
+                start = time.perf_counter()
+                send(history)
+                request_times.append(time.perf_counter() - start)
+
+        results[label] = (current, peak, sum(request_times) / len(request_times), sent[-1])
+
+    print(f"📊 Message history benchmark ({turns:,} turns, {turns * 4:,} messages)")
+    for label, (current, peak, request_time, body_size) in results.items():
+        print(f"  {label:<20} memory: {current / 1024:>7,.0f} KiB (peak {peak / 1024:,.0f} KiB)"
+              f" | request: {request_time * 1000:>7.2f} ms on average (body {body_size / 1024:,.0f} KiB at the last turn)")
+
+if __name__ == "__main__":
+    _benchmark()
@@ -0,0 +1,266 @@
+# common/planner.py
+
+"""
+Planner Module
+
+Instead of paying one LLM round trip per ReAct step, the planner asks the model for the
+whole tool plan up front, as a small dependency graph (DAG) of tool calls:
+
+    {"steps": [
+        {"id": "a", "tool": "search_web", "args": {"query": "bitcoin price today"}, "extract": "bitcoin price in USD"},
+        {"id": "b", "tool": "search_web", "args": {"query": "ethereum price today"}, "extract": "ethereum price in USD"},
+        {"id": "c", "tool": "calculator", "args": {"expression": "{a} - {b}"}, "depends_on": ["a", "b"]}
+    ]}
+
+Independent steps run in parallel and results are substituted into the '{id}' placeholders
+of dependent steps. Calculator results are numbers already; for a search step the plan
+names the number to take from it ("extract": "bitcoin price in USD"), and ONE small
+structured LLM call pulls out every number a step needs. The results are handed back to
+the agent as regular tool messages - so the normal loop only needs one more LLM call to
+answer, however many steps the plan has.
+If the plan is missing, invalid or a step cannot be resolved, the agent simply carries
+on with its usual step-by-step loop.
+"""
+
+# Import required libraries
+import json
+import re
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from common.deadline import Deadline
+
+# Placeholder syntax used inside step arguments, e.g. "{a} * 5"
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+
+PLANNER_PROMPT = """
+You are a planning module for a tool-using assistant. Do NOT answer the question.
+Plan the tool calls needed to answer the user's latest message and output ONLY a JSON object:
+{{"steps": [{{"id": "a", "tool": "<tool name>", "args": {{...}}, "depends_on": []}}]}}
+
+Rules:
+- Use short unique ids ("a", "b", "c", ...).
+- Steps that do not depend on each other will run in parallel.
+- A step can use the NUMERIC result of an earlier step with a placeholder like "{{a}}" in its args
+  (e.g. "expression": "{{a}} * 5") and must then list that step in "depends_on".
+- Search results are text: if a later step needs a number from a search step, add
+  "extract": "<the number to take from its result, with unit>" to that search step
+  (e.g. {{"id": "a", "tool": "search_web", "args": {{"query": "bitcoin price today"}}, "extract": "bitcoin price in USD"}}).
+- If no tool is needed, output {{"steps": []}}.
+
+Available tools:
+{tools}
+"""
+
+EXTRACT_PROMPT = """
+Extract numbers from tool results. For every id below, find the requested number in its text.
+Output ONLY a JSON object mapping each id to a plain number (no units, no thousands separators),
+or null if the text does not contain it, e.g. {{"a": 95000.5, "b": null}}.
+
+{items}
+"""
+
+# How much of each result is shown to the extraction call
+MAX_EXTRACT_CHARS = 2000
+
+
+def _describe_tools(tools_schema: list[dict]) -> str:
+    """Renders the native tool schema as a compact list for the planner prompt."""
+    lines = []
+    for tool in tools_schema:
+        function = tool["function"]
+        args = ", ".join(function["parameters"].get("properties", {}))
+        lines.append(f"- {function['name']}({args}): {function['description']}")
+    return "\n".join(lines)
+
+
+def parse_plan(text: str, tool_names: set[str]) -> Optional[list[dict]]:
+    """
+    Parses and validates the planner output.
+    Returns the steps in a dependency-safe order, or None if the plan is unusable.
+    """
+    try:
+        steps = json.loads(text).get("steps")
+    except (json.JSONDecodeError, AttributeError):
+        return None
+    if not isinstance(steps, list):
+        return None
+
+    # Every step needs a unique id, a known tool and dict arguments
+    by_id = {}
+    for step in steps:
+        if not isinstance(step, dict) or not isinstance(step.get("args"), dict):
+            return None
+        step_id = str(step.get("id", ""))
+        if not step_id or step_id in by_id or step.get("tool") not in tool_names:
+            return None
+        step["id"] = step_id
+        # Placeholders count as dependencies even if the model forgot to list them
+        referenced = {m for v in step["args"].values() if isinstance(v, str) for m in PLACEHOLDER.findall(v)}
+        step["depends_on"] = sorted(set(map(str, step.get("depends_on") or [])) | referenced)
+        by_id[step_id] = step
+
+    # Reject unknown dependencies and cycles (Kahn's topological sort)
+    if any(dep not in by_id for step in steps for dep in step["depends_on"]):
+        return None
+    ordered, done = [], set()
+    while len(ordered) < len(steps):
+        ready = [s for s in steps if s["id"] not in done and all(d in done for d in s["depends_on"])]
+        if not ready:
+            return None
+        ordered.extend(ready)
+        done.update(s["id"] for s in ready)
+    return ordered
+
+
+def _as_number(result: str) -> Optional[str]:
+    """Returns the result if it is a plain number (what a calculator step produces), otherwise None."""
+    try:
+        float(result.strip())
+        return result.strip()
+    except (ValueError, AttributeError):
+        return None
+
+
+def _resolve_args(step: dict, results: dict[str, str], by_id: dict[str, dict], extract=None) -> Optional[dict]:
+    """
+    Substitutes '{id}' placeholders with numeric results. Returns None if one cannot be resolved.
+    Non-numeric results (e.g. search snippets) are handed to 'extract' - all of them in one call.
+    """
+    refs = {ref for value in step["args"].values() if isinstance(value, str) for ref in PLACEHOLDER.findall(value)}
+    numbers = {ref: _as_number(results.get(ref)) for ref in refs}
+
+    # Pull the missing numbers out of the text results
+    missing = {ref: (by_id[ref].get("extract") or f"the number needed from {by_id[ref]['tool']} {json.dumps(by_id[ref]['args'])}",
+                     results[ref])
+               for ref, number in numbers.items() if number is None}
+    if missing and extract:
+        numbers.update(extract(missing))
+    if any(numbers.get(ref) is None for ref in refs):
+        return None
+
+    resolved = {}
+    for key, value in step["args"].items():
+        if isinstance(value, str):
+            for ref in PLACEHOLDER.findall(value):
+                value = value.replace(f"{{{ref}}}", f"({numbers[ref]})")
+        resolved[key] = value
+    return resolved
+
+
+def _run_step(step: dict, results: dict[str, str], by_id: dict[str, dict], run_tool, extract=None) -> str:
+    """Resolves the inputs of a step and runs its tool (in a worker thread, so extraction doesn't block other steps)."""
+    args = _resolve_args(step, results, by_id, extract)
+    if args is None:
+        # A dependency did not produce a number - leave this step to the normal loop
+        return "Error: Could not resolve the inputs of this step from earlier results."
+    step["resolved_args"] = args
+    return run_tool(step["tool"], args)
+
+
+def extract_numbers(client, model: str, items: dict[str, tuple[str, str]], deadline: Deadline = None) -> dict[str, str]:
+    """
+    Pulls numbers out of text results with a single structured LLM call.
+    'items' maps a step id to (what to extract, result text). Returns {step_id: number} for every number found.
+    """
+    listing = "\n\n".join(f'id "{ref}" - {what}:\n{text[:MAX_EXTRACT_CHARS]}' for ref, (what, text) in items.items())
+    # Only pass a timeout when the agent runs with a time budget
+    request_options = {"timeout": deadline.timeout()} if deadline else {}
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": EXTRACT_PROMPT.format(items=listing)}],
+            response_format={"type": "json_object"},
+            max_tokens=200,
+            **request_options
+        )
+        values = json.loads(response.choices[0].message.content)
+    except Exception as e:
+        print(f"⚠️ Could not extract numbers from the step results: {e}")
+        return {}
+    if not isinstance(values, dict):
+        return {}
+    # Keep real numbers only (JSON true/false would pass as int)
+    return {ref: str(values[ref]) for ref in items
+            if isinstance(values.get(ref), (int, float)) and not isinstance(values.get(ref), bool)}
+
+
+def execute_plan(steps: list[dict], run_tool, max_workers: int = 4, deadline: Deadline = None,
+                 extract=None) -> dict[str, str]:
+    """
+    Executes the plan as a DAG: every step starts as soon as all of its dependencies are done.
+    'run_tool(name, args)' is the agent's tool router. Returns a {step_id: result} dictionary.
+    'extract(items)' (e.g. extract_numbers) turns text results into the numbers dependent steps need.
+    With a deadline, steps still unfinished when it expires are abandoned and reported as errors.
+    """
+    results, pending, running = {}, list(steps), {}
+    by_id = {step["id"]: step for step in steps}
+
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while (pending or running) and not (deadline and deadline.expired()):
+            # Start every step whose dependencies are finished
+            for step in [s for s in pending if all(d in results for d in s["depends_on"])]:
+                pending.remove(step)
+                running[pool.submit(_run_step, step, dict(results), by_id, run_tool, extract)] = step
+
+            # Nothing can start right now - wait for at least one running step to finish
+            if running:
+                timeout = deadline.remaining() if deadline else None
+                finished, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    step = running.pop(future)
+                    try:
+                        results[step["id"]] = str(future.result())
+                    except Exception as e:
+                        results[step["id"]] = f"Error: {str(e)}"
+    finally:
+        # Don't wait for abandoned steps (queued ones are cancelled, running ones are left to finish alone)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    # Whatever is left did not make it before the deadline
+    for step in pending + list(running.values()):
+        results[step["id"]] = "Error: Deadline exceeded before this step could finish."
+    return results
+
+
+def plan_tool_calls(client, model: str, messages: list, tools_schema: list[dict],
+                    deadline: Deadline = None) -> Optional[list[dict]]:
+    """Asks the LLM for a tool plan in a single call. Returns the validated steps, or None."""
+    tool_names = {tool["function"]["name"] for tool in tools_schema}
+    # Only pass a timeout when the agent runs with a time budget
+    request_options = {"timeout": deadline.timeout()} if deadline else {}
+    try:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": PLANNER_PROMPT.format(tools=_describe_tools(tools_schema))}]
+                     + messages[1:],  # Skip the agent's own system prompt
+            response_format={"type": "json_object"},
+            max_tokens=1024,
+            **request_options
+        )
+        return parse_plan(response.choices[0].message.content, tool_names)
+    except Exception as e:
+        print(f"⚠️ Planner unavailable, falling back to step-by-step mode: {e}")
+        return None
+
+
+def plan_to_messages(steps: list[dict], results: dict[str, str]) -> list[dict]:
+    """
+    Converts the executed plan into native tool-calling history:
+    one assistant message holding all the tool calls, followed by one tool message per step.
+    """
+    tool_calls = [{
+        "id": f"plan_{step['id']}",
+        "type": "function",
+        "function": {"name": step["tool"], "arguments": json.dumps(step.get("resolved_args", step["args"]))}
+    } for step in steps]
+
+    messages = [{"role": "assistant", "tool_calls": tool_calls}]
+    messages.extend({
+        "role": "tool",
+        "tool_call_id": f"plan_{step['id']}",
+        "name": step["tool"],
+        "content": results[step["id"]],
+    } for step in steps)
+    return messages
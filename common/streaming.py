@@ -0,0 +1,131 @@
+# common/streaming.py
+
+"""
+Streaming Tool-Action Parser
+
+The manual (prompt-based) agents ask the LLM to answer with a JSON object like
+{"action": "search", ...} or {"tool": "calculator", ...} when they need a tool. Waiting for the
+whole completion and then calling json.loads on it wastes time (the model often keeps talking
+after the JSON) and fails when the JSON is surrounded by prose.
+
+ToolActionParser reads the completion token by token and recognizes the first JSON object that
+contains one of the expected keys (and passes the optional 'accept' check, e.g. only
+{"action": "search"}) as soon as its closing brace arrives - even in the middle of text. stream_tool_action() then stops the stream right away, which cancels the rest of the
+generation, so the tool can be dispatched immediately.
+"""
+
+# Import required libraries
+import json
+from typing import Optional
+
+from common.deadline import Deadline, DeadlineExceeded
+
+
+class ToolActionParser:
+    """Incremental scanner that finds a tool-action JSON object in streamed text."""
+
+    def __init__(self, keys: tuple = ("action", "tool"), accept=None):
+        self.keys = keys
+        self.accept = accept    # Optional check, e.g. lambda action: action.get("action") == "search"
+        self._buffer = ""       # All text received so far
+        self._starts = []       # Positions of the currently open '{' (a stack, for nested objects)
+        self._in_string = False
+        self._escape = False
+        self.end = None         # Position right after the detected action object
+
+    @property
+    def text(self) -> str:
+        """The text received so far (up to the end of the detected action, if any)."""
+        return self._buffer[:self.end] if self.end is not None else self._buffer
+
+    def feed(self, chunk: str) -> Optional[dict]:
+        """Adds a chunk of streamed text. Returns the tool action as soon as its object is complete."""
+        offset = len(self._buffer)
+        self._buffer += chunk
+        for i, char in enumerate(chunk, offset):
+            # Outside of any object we only wait for an opening brace (quotes in prose are ignored)
+            if not self._starts:
+                if char == "{":
+                    self._starts.append(i)
+                continue
+
+            # Inside a JSON string braces don't count
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._starts.append(i)
+            elif char == "}":
+                # An object just closed: is it a tool action?
+                # (checking every level also recovers from a stray '{' in the prose before the JSON)
+                action = self._as_action(self._buffer[self._starts.pop():i + 1])
+                if action is not None:
+                    self.end = i + 1
+                    return action
+        return None
+
+    def finish(self) -> Optional[dict]:
+        """
+        Called when the stream has ended without a detected action.
+        Does one last search for an action object anywhere in the text (e.g. after an unbalanced '{' in prose).
+        """
+        decoder = json.JSONDecoder()
+        start = self._buffer.find("{")
+        while start != -1:
+            try:
+                obj, end = decoder.raw_decode(self._buffer, start)
+                if self._is_action(obj):
+                    self.end = end
+                    return obj
+            except json.JSONDecodeError:
+                pass
+            start = self._buffer.find("{", start + 1)
+        return None
+
+    def _is_action(self, obj) -> bool:
+        """An action is a dict with one of the action keys that passes the 'accept' check (if any)."""
+        return (isinstance(obj, dict) and any(key in obj for key in self.keys)
+                and (self.accept is None or bool(self.accept(obj))))
+
+    def _as_action(self, candidate: str) -> Optional[dict]:
+        """Parses a complete '{...}' candidate and keeps it only if it is an action."""
+        try:
+            obj = json.loads(candidate)
+        except json.JSONDecodeError:
+            return None
+        return obj if self._is_action(obj) else None
+
+
+def stream_tool_action(client, keys: tuple = ("action", "tool"), deadline: Deadline = None, accept=None, **request):
+    """
+    Streams a completion and stops as soon as a tool action has been generated.
+    Only objects that pass 'accept' stop the stream (other JSON, e.g. quoted in a prose answer, is just text).
+    Returns (text, action): the text up to the end of the action (or the whole answer) and the
+    parsed action dictionary (None if the completion is a final answer).
+    """
+    parser = ToolActionParser(keys, accept)
+    stream = client.chat.completions.create(stream=True, **request)
+    action = None
+    try:
+        for chunk in stream:
+            # The request timeout only limits each read - also enforce the overall deadline
+            if deadline and deadline.expired():
+                raise DeadlineExceeded("Query deadline exceeded while streaming the completion.")
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                action = parser.feed(delta)
+                if action is not None:
+                    break
+    finally:
+        # Closing the stream drops the connection, which cancels the rest of the generation
+        stream.close()
+
+    if action is None:
+        action = parser.finish()
+    return parser.text, action
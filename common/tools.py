@@ -1,54 +1,174 @@
 # common/tools.py
 # Shared tools for agents
 
+# Import standard libraries for the parallel search fan-out
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Record/replay support (see common/cassette.py)
+from common.cassette import recordable
+
 # Import the DDGS class from ddgs (DuckDuckGo Search)
 from ddgs import DDGS
 
 # Import numexpr for safe evaluation of mathematical expressions
 import numexpr as ne
 
+# Isolated worker processes for the calculator (see common/calculator_pool.py)
+from common.calculator_pool import POOL_ENABLED, get_calculator_pool
+
+
+# Minimum gap (in seconds) between two DuckDuckGo requests, shared by every search tool
+SEARCH_MIN_INTERVAL = 1.0
+
+# Reciprocal-rank fusion constant (60 is the value from the original RRF paper)
+RRF_K = 60
+
+
+class _RateLimiter:
+    """
+    A tiny thread-safe rate limiter.
+    Every caller reserves the next free slot, so parallel searches are spaced out
+    instead of hitting DuckDuckGo all at the same moment.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self) -> None:
+        # Reserve a slot while holding the lock, then sleep outside of it
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.min_interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+# One limiter for the whole process, shared by search_web and search_many
+_search_limiter = _RateLimiter(SEARCH_MIN_INTERVAL)
+
+
+def _fetch_results(query: str, max_results: int) -> list[dict]:
+    """Runs a single DuckDuckGo text search (respecting the rate limiter) and returns the raw hits."""
+    _search_limiter.wait()
+    with DDGS() as ddgs:
+        # use the 'text' method which is current for 2026
+        return list(ddgs.text(query, max_results=max_results))
+
+
+def _format_hit(i: int, r: dict) -> str:
+    """Formats a single search hit into the text block the LLM reads."""
+    # Using .get() with defaults is safer for agentic workflows
+    title = r.get('title', 'No Title')
+    body = r.get('body', 'No Content')
+    href = r.get('href', '#')
+    return f"[{i}] {title}\nSource: {href}\nContent: {body}"
+
 
+def _search_error(e: Exception) -> str:
+    """Turns a search exception into a message the agent can act on."""
+    # If it's a rate limit error, the agent should know to wait
+    if "Ratelimit" in str(e):
+        return "Error: Search rate limit hit. Please wait a moment before trying again."
+    # If something else goes wrong, return the error message
+    return f"Search Error: {str(e)}"
+
+
+@recordable
 def search_web(query: str, max_results: int = 3) -> str:
     """
     Search the web using DuckDuckGo and return a concatenated string of snippets.
     """
     try:
-        # We initialize without a context manager to manage retries if needed
-        with DDGS() as ddgs:
-            # use the 'text' method which is current for 2026
-            results = list(ddgs.text(query, max_results=max_results))
-            
-            # If no results are found, return a message
-            if not results:
-                return f"No results found for '{query}'. Try a broader search term."
-            
-            # Format the results into a single string for the LLM to read
-            formatted_results = []
-            for i, r in enumerate(results, 1):
-                # Using .get() with defaults is safer for agentic workflows
-                title = r.get('title', 'No Title')
-                body = r.get('body', 'No Content')
-                href = r.get('href', '#')
-                
-                formatted_results.append(f"[{i}] {title}\nSource: {href}\nContent: {body}")
-            
-            # Return the formatted results
-            return "\n\n".join(formatted_results)
-    
+        results = _fetch_results(query, max_results)
+
+        # If no results are found, return a message
+        if not results:
+            return f"No results found for '{query}'. Try a broader search term."
+
+        # Format the results into a single string for the LLM to read
+        formatted_results = [_format_hit(i, r) for i, r in enumerate(results, 1)]
+
+        # Return the formatted results
+        return "\n\n".join(formatted_results)
+
     # If an error occurs, return an error message
     except Exception as e:
-        # If it's a rate limit error, the agent should know to wait
-        if "Ratelimit" in str(e):
-            return "Error: Search rate limit hit. Please wait a moment before trying again."
-        # If something else goes wrong, return the error message
-        return f"Search Error: {str(e)}"
+        return _search_error(e)
+
+
+@recordable
+def search_many(queries: list[str], max_results: int = 3, top_k: int = 5, max_workers: int = 3) -> str:
+    """
+    Search the web for several reformulations of a question in one go.
+
+    The queries run concurrently on a small thread pool (sharing the search rate limiter),
+    hits are de-duplicated by URL and merged with reciprocal-rank fusion (RRF),
+    so a page that ranks well for several queries comes out on top.
+    """
+    # A single query may come in as a plain string - don't search letter by letter
+    if isinstance(queries, str):
+        queries = [queries]
+
+    # Drop empty and duplicate queries, keeping the original order
+    queries = list(dict.fromkeys(q.strip() for q in queries if q and q.strip()))
+    if not queries:
+        return "Error: No search queries provided."
+
+    # Step 1: Run all the queries concurrently (bounded pool)
+    hits_per_query, errors = {}, []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as pool:
+        futures = {pool.submit(_fetch_results, q, max_results): q for q in queries}
+        for future in as_completed(futures):
+            query = futures[future]
+            try:
+                hits_per_query[query] = future.result()
+            except Exception as e:
+                errors.append(f"'{query}': {_search_error(e)}")
+
+    # Step 2: De-duplicate by URL and fuse the rankings (score = sum of 1 / (k + rank))
+    scores, hits, matched = {}, {}, {}
+    for query in queries:
+        for rank, r in enumerate(hits_per_query.get(query, []), 1):
+            key = r.get('href') or r.get('title') or r.get('body', '')
+            scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank)
+            hits.setdefault(key, r)
+            matched.setdefault(key, []).append(query)
+
+    # If nothing came back, report the errors (or the empty result)
+    if not scores:
+        if errors:
+            return "\n".join(errors)
+        return f"No results found for any of: {', '.join(repr(q) for q in queries)}. Try broader search terms."
+
+    # Step 3: Keep the top_k fused hits and format them for the LLM
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    formatted_results = [
+        f"{_format_hit(i, hits[key])}\nMatched queries: {len(matched[key])}/{len(queries)}"
+        for i, key in enumerate(ranked, 1)
+    ]
+    # Let the agent know if some of the queries failed
+    if errors:
+        formatted_results.append("Some queries failed:\n" + "\n".join(errors))
+
+    return "\n\n".join(formatted_results)
 
 
+@recordable
 def calculator(expression: str) -> str:
     """Evaluates a mathematical expression safely."""
     try:
-        # Using numexpr for safe evaluation
-        result = ne.evaluate(expression)
+        # Using numexpr for safe evaluation, in an isolated worker process with time/CPU/memory limits
+        # (so one pathological expression can't stall or bloat the agent process)
+        if POOL_ENABLED:
+            result = get_calculator_pool().evaluate(expression)
+        else:
+            result = ne.evaluate(expression)
         print(f"Expression: {expression} ------ Result: {result}")
         return str(result)
     except Exception as e: